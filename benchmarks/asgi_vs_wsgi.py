@@ -0,0 +1,126 @@
+"""
+Сравнение WSGI и ASGI на страницах чтения заметок.
+
+Оба приложения вызываются в процессе, без сетевого сервера: WSGI из пула
+потоков, ASGI из конкурентных задач asyncio. Так сравнивается сам стек
+Django, а не веб-сервер.
+
+    python -m benchmarks.asgi_vs_wsgi --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import common
+
+PAGES = {
+    'list': '/notes/',
+    'detail': '/note/{slug}/',
+    'api-list': '/api/notes/',
+}
+
+
+def wsgi_request(application, path, cookie):
+    status, elapsed = common.call_wsgi(
+        application, common.wsgi_environ('GET', path, cookie)
+    )
+    assert status.startswith('200'), status
+    return elapsed
+
+
+def run_wsgi(path, cookie, requests, concurrency):
+    from yanote.wsgi import application
+    with ThreadPoolExecutor(concurrency) as pool, common.Timer() as timer:
+        latencies = list(pool.map(
+            lambda _: wsgi_request(application, path, cookie),
+            range(requests),
+        ))
+    return latencies, timer.elapsed
+
+
+async def asgi_request(application, path, cookie):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    started = time.perf_counter()
+    await application(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    assert messages[0]['status'] == 200, messages[0]
+    return elapsed
+
+
+async def run_asgi(path, cookie, requests, concurrency):
+    from yanote.asgi import application
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            return await asgi_request(application, path, cookie)
+
+    with common.Timer() as timer:
+        latencies = await asyncio.gather(
+            *(limited() for _ in range(requests))
+        )
+    return latencies, timer.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--page', choices=PAGES, default='list')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--notes', type=int, default=50)
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Отключить кэш страниц, чтобы каждый запрос шёл в базу.'
+    )
+    args = parser.parse_args()
+
+    common.setup_django()
+    from django.test.utils import override_settings
+    common.create_database()
+    author = common.create_author()
+    common.create_notes(author, args.notes)
+    cookie = common.session_cookie(author)
+    path = PAGES[args.page].format(slug=f'{author.username}-0')
+
+    overrides = {}
+    if args.no_cache:
+        overrides['CACHES'] = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }}
+    with override_settings(**overrides):
+        print(
+            f'{path}: {args.requests} запросов, '
+            f'параллельно {args.concurrency}'
+        )
+        common.report(
+            'WSGI', *run_wsgi(path, cookie, args.requests, args.concurrency)
+        )
+        common.report('ASGI', *asyncio.run(
+            run_asgi(path, cookie, args.requests, args.concurrency)
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Общие помощники бенчмарков.
+
+Бенчмарки запускаются как модули из корня проекта, например
+``python -m benchmarks.asgi_vs_wsgi``, и работают с временной базой SQLite
+в памяти, поэтому не трогают db.sqlite3.
+"""
+import os
+import sys
+import time
+from io import BytesIO
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+    django.setup()
+
+
+def create_database():
+    """Создаёт и мигрирует базу в памяти, общую для всех потоков."""
+    from django.db import connection
+    connection.creation.create_test_db(verbosity=0)
+
+
+def create_author(username='bench'):
+    from django.contrib.auth import get_user_model
+    return get_user_model().objects.create(username=username)
+
+
+def create_notes(author, count, text_length=500, batch_size=1000):
+    from notes.models import Note
+    text = ('Текст заметки для замеров. ' * text_length)[:text_length]
+    notes = []
+    for number in range(count):
+        note = Note(
+            title=f'Заметка {number}',
+            text=text,
+            slug=f'{author.username}-{number}',
+            author=author,
+        )
+        note.refresh_derived_fields()
+        notes.append(note)
+    Note.objects.bulk_create(notes, batch_size=batch_size)
+
+
+def session_cookie(user):
+    """Cookie авторизованной сессии для запросов в обход тестового клиента."""
+    from django.conf import settings
+    from django.test import Client
+    client = Client()
+    client.force_login(user)
+    name = settings.SESSION_COOKIE_NAME
+    return f'{name}={client.cookies[name].value}'
+
+
+def wsgi_environ(method, path, cookie, body=b'', content_type=''):
+    """Окружение WSGI для вызова приложения в процессе."""
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def call_wsgi(application, environ):
+    """Вызывает приложение, возвращает статус и время ответа."""
+    statuses = []
+    started = time.perf_counter()
+    body = application(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    for _ in body:
+        pass
+    body.close()
+    return statuses[0], time.perf_counter() - started
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+    return ordered[index]
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.started
+
+
+def report(title, latencies, elapsed):
+    """Печатает запросы в секунду и перцентили задержки в миллисекундах."""
+    print(
+        f'{title:<10} {len(latencies) / elapsed:10.1f} req/s   '
+        f'p50 {percentile(latencies, 50) * 1000:8.2f} ms   '
+        f'p99 {percentile(latencies, 99) * 1000:8.2f} ms'
+    )
@@ -0,0 +1,102 @@
+"""
+Данные для бюджетных бенчмарков.
+
+Объём задаётся переменной окружения BENCH_SCALE: 1k (по умолчанию),
+100k или 1m заметок, распределённых между многими авторами. База
+заполняется один раз на сессию, каждый тест работает в своей транзакции.
+"""
+import json
+import math
+import os
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+
+BUDGETS_PATH = Path(__file__).with_name('budgets.json')
+
+# Масштаб: (число заметок, число авторов).
+SCALES = {
+    '1k': (1_000, 20),
+    '100k': (100_000, 500),
+    '1m': (1_000_000, 5_000),
+}
+
+
+@pytest.fixture(scope='session')
+def scale():
+    return os.getenv('BENCH_SCALE', '1k')
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker, scale):
+    notes, authors = SCALES[scale]
+    with django_db_blocker.unblock():
+        call_command(
+            'seed_notes', users=authors, notes=notes, prefix='bench',
+            stdout=StringIO()
+        )
+        call_command(
+            'rebuild_search_index', batch_size=5000, stdout=StringIO()
+        )
+
+
+@pytest.fixture(scope='session')
+def bench_author(django_db_setup, django_db_blocker):
+    from django.contrib.auth import get_user_model
+    with django_db_blocker.unblock():
+        author = get_user_model().objects.order_by('id').first()
+        author.is_staff = True
+        author.save()
+    return author
+
+
+@pytest.fixture
+def bench_client(db, bench_author):
+    client = Client()
+    client.force_login(bench_author)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def no_page_cache(settings):
+    """Кэш страниц выключен: замеряется работа представлений, а не кэша."""
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }}
+
+
+@pytest.fixture(autouse=True)
+def no_quotas(settings):
+    """
+    У первого автора на больших масштабах заметок больше квоты: без
+    этого замерялся бы отказ формы, а не создание заметки.
+    """
+    settings.NOTES_QUOTA_NOTES = 0
+    settings.NOTES_QUOTA_BYTES = 0
+
+
+@pytest.fixture(scope='session')
+def budgets(scale):
+    """
+    Сохранённые бюджеты текущего масштаба. С BENCH_UPDATE_BUDGETS=1 тесты
+    не падают, а по окончании сессии записывают новые бюджеты с запасом
+    по времени.
+    """
+    with open(BUDGETS_PATH, encoding='utf-8') as source:
+        saved = json.load(source)
+    measured = {}
+    yield saved.get(scale), measured
+    if os.getenv('BENCH_UPDATE_BUDGETS') and measured:
+        saved[scale] = {
+            route: {
+                'queries': result['queries'],
+                'ms': max(50, math.ceil(result['ms'] * 3)),
+            }
+            for route, result in measured.items()
+        }
+        with open(BUDGETS_PATH, 'w', encoding='utf-8') as output:
+            json.dump(saved, output, indent=2, sort_keys=True)
+            output.write('\n')
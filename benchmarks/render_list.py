@@ -0,0 +1,81 @@
+"""
+Отрисовка списка из большого числа заметок.
+
+Сравнивает строки списка с тегом url на каждую заметку и с фильтром
+note_url, а также время отрисовки всей страницы notes/list.html. Заметки
+создаются в памяти, база не нужна.
+
+    python -m benchmarks.render_list --notes 10000 --repeat 10
+"""
+import argparse
+
+from benchmarks import common
+
+ROWS = {
+    'url tag': (
+        '{% for note in notes %}'
+        '<a href="{% url \'notes:detail\' note.slug %}">{{ note.title }}</a>'
+        '{% endfor %}'
+    ),
+    'note_url': (
+        '{% load notes_extras %}{% for note in notes %}'
+        '<a href="{{ note.slug|note_url }}">{{ note.title }}</a>'
+        '{% endfor %}'
+    ),
+}
+
+
+def render_repeatedly(render, repeat):
+    latencies = []
+    with common.Timer() as total:
+        for _ in range(repeat):
+            with common.Timer() as timer:
+                render()
+            latencies.append(timer.elapsed)
+    return latencies, total.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    common.setup_django()
+    from django.contrib.auth import get_user_model
+    from django.template import engines
+    from django.template.loader import render_to_string
+    from django.test import RequestFactory
+    from notes.models import Note
+
+    user = get_user_model()(pk=1, username='bench')
+    notes = [
+        Note(
+            id=number, title=f'Заметка {number}', slug=f'bench-{number}',
+            preview='Текст заметки для замеров.', author=user,
+        )
+        for number in range(args.notes)
+    ]
+    for note in notes:
+        # Как после prefetch_related в NotesList: тегов нет, запросов тоже.
+        note._prefetched_objects_cache = {'tags': []}
+    request = RequestFactory().get('/notes/')
+    request.user = user
+    engine = engines.all()[0]
+
+    print(f'{args.notes} заметок, {args.repeat} повторов')
+    for title, source in ROWS.items():
+        template = engine.from_string(source)
+        common.report(title, *render_repeatedly(
+            lambda: template.render({'notes': notes}), args.repeat
+        ))
+    common.report('list.html', *render_repeatedly(
+        lambda: render_to_string(
+            'notes/list.html', {'object_list': notes}, request
+        ),
+        args.repeat,
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Запросы к базе на страницу при разных режимах сессий.
+
+Для каждого режима YANOTE_SESSION_MODE считается, сколько запросов к базе
+уходит на страницу и сколько из них читают сессию и пользователя.
+
+    python -m benchmarks.session_queries --requests 200
+"""
+import argparse
+
+from benchmarks import common
+
+MODES = {
+    'db': ['django.contrib.auth.backends.ModelBackend'],
+    'cached_db': ['notes.backends.CachedModelBackend'],
+    'signed_cookies': ['notes.backends.CachedModelBackend'],
+}
+PAGES = {
+    'list': '/notes/',
+    'detail': '/note/{slug}/',
+}
+AUTH_TABLES = ('django_session', 'auth_user')
+
+
+def measure(author, path, requests):
+    """Средние запросы на страницу: всего и к сессии с пользователем."""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    client.force_login(author)
+    # Первый запрос заполняет кэш сессии и пользователя.
+    assert client.get(path).status_code == 200
+    latencies = []
+    with CaptureQueriesContext(connection) as queries, \
+            common.Timer() as total:
+        for _ in range(requests):
+            with common.Timer() as timer:
+                assert client.get(path).status_code == 200
+            latencies.append(timer.elapsed)
+    auth_queries = sum(
+        any(table in query['sql'] for table in AUTH_TABLES)
+        for query in queries.captured_queries
+    )
+    return (
+        len(queries) / requests, auth_queries / requests,
+        latencies, total.elapsed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--page', choices=PAGES, default='list')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--notes', type=int, default=50)
+    args = parser.parse_args()
+
+    common.setup_django()
+    from django.test.utils import override_settings
+    common.create_database()
+    author = common.create_author()
+    common.create_notes(author, args.notes)
+    path = PAGES[args.page].format(slug=f'{author.username}-0')
+
+    print(f'{path}: {args.requests} запросов')
+    for mode, backends in MODES.items():
+        with override_settings(
+            SESSION_ENGINE=f'django.contrib.sessions.backends.{mode}',
+            AUTHENTICATION_BACKENDS=backends,
+        ):
+            total, auth, latencies, elapsed = measure(
+                author, path, args.requests
+            )
+        common.report(mode, latencies, elapsed)
+        print(
+            f'{"":<10} запросов к базе: {total:.1f}, '
+            f'из них сессия и пользователь: {auth:.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Нагрузка конкурентными писателями на SQLite в разных профилях базы.
+
+Каждый поток от имени своего автора отправляет POST на notes:add через
+WSGI-приложение в процессе. Для каждого профиля запускается отдельный
+процесс с новым файлом базы, так как профиль читается из окружения при
+загрузке настроек.
+
+    python -m benchmarks.sqlite_writers --writers 8 --requests 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from benchmarks import common
+
+PROFILES = ('development', 'production')
+
+
+def post_notes(application, cookie, token, writer, requests):
+    """Создаёт заметки от одного автора, возвращает задержки и ошибки."""
+    latencies, errors = [], 0
+    for number in range(requests):
+        body = urlencode({
+            'title': f'Заметка {writer}-{number}',
+            'text': 'Текст заметки под нагрузкой.',
+            'csrfmiddlewaretoken': token,
+        }).encode()
+        environ = common.wsgi_environ(
+            'POST', '/add/', f'{cookie}; csrftoken={token}', body,
+            'application/x-www-form-urlencoded',
+        )
+        status, elapsed = common.call_wsgi(application, environ)
+        if status.startswith('302'):
+            latencies.append(elapsed)
+        else:
+            errors += 1
+    return latencies, errors
+
+
+def run_profile(writers, requests):
+    """Замер в текущем процессе, профиль уже задан окружением."""
+    common.setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.middleware.csrf import _get_new_csrf_token
+    from yanote.wsgi import application
+
+    call_command('migrate', verbosity=0)
+    cookies = [
+        common.session_cookie(common.create_author(f'writer-{number}'))
+        for number in range(writers)
+    ]
+    connection.close()
+    token = _get_new_csrf_token()
+    with ThreadPoolExecutor(writers) as pool, common.Timer() as timer:
+        results = list(pool.map(
+            lambda writer: post_notes(
+                application, cookies[writer], token, writer, requests
+            ),
+            range(writers),
+        ))
+    latencies = [value for result in results for value in result[0]]
+    errors = sum(result[1] for result in results)
+    common.report(os.environ['YANOTE_DB_PROFILE'], latencies, timer.elapsed)
+    print(f'{"":<10} ошибок: {errors} из {writers * requests}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        return run_profile(args.writers, args.requests)
+    print(
+        f'notes:add: {args.writers} писателей '
+        f'по {args.requests} запросов'
+    )
+    for profile in PROFILES:
+        with tempfile.TemporaryDirectory() as directory:
+            environ = dict(
+                os.environ,
+                YANOTE_DB_PROFILE=profile,
+                YANOTE_DB_NAME=os.path.join(directory, 'bench.sqlite3'),
+            )
+            subprocess.run(
+                [
+                    sys.executable, '-m', 'benchmarks.sqlite_writers',
+                    '--profile', profile,
+                    '--writers', str(args.writers),
+                    '--requests', str(args.requests),
+                ],
+                env=environ, check=True,
+            )
+
+
+if __name__ == '__main__':
+    main()
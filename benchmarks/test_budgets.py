@@ -0,0 +1,112 @@
+"""
+Бюджеты запросов к базе и времени ответа для маршрутов notes.urls
+и auth_urls. Запуск: ``pytest benchmarks``; обновить бюджеты:
+``BENCH_UPDATE_BUDGETS=1 pytest benchmarks``.
+"""
+import json
+import os
+from http import HTTPStatus
+from statistics import median
+from time import perf_counter
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+RUNS = 5
+
+# (имя маршрута, метод, нужен ли slug заметки).
+ROUTES = (
+    ('notes:home', 'get', False),
+    ('notes:list', 'get', False),
+    ('notes:add', 'get', False),
+    ('notes:add', 'post', False),
+    ('notes:detail', 'get', True),
+    ('notes:edit', 'get', True),
+    ('notes:delete', 'get', True),
+    ('notes:search', 'get', False),
+    ('notes:success', 'get', False),
+    ('notes:perf', 'get', False),
+    ('notes:api-list', 'get', False),
+    ('notes:api-detail', 'get', True),
+    ('notes:api-changes', 'get', False),
+    ('notes:api-bulk-update', 'post', False),
+    ('notes:api-bulk-delete', 'post', False),
+    ('users:login', 'get', False),
+    ('users:logout', 'get', False),
+    ('users:signup', 'get', False),
+)
+
+
+def make_request(client, method, url, run, author):
+    if url == reverse('notes:api-bulk-update'):
+        note = author.note_set.order_by('id').first()
+        return client.post(url, json.dumps({'notes': [
+            {'id': note.id, 'text': f'Текст {run}'},
+        ]}), content_type='application/json')
+    if url == reverse('notes:api-bulk-delete'):
+        # Каждый повтор удаляет следующую заметку автора.
+        note = author.note_set.order_by('id')[run]
+        return client.post(
+            url, json.dumps({'ids': [note.id]}),
+            content_type='application/json'
+        )
+    if method == 'post':
+        return client.post(url, {
+            'title': f'Новая заметка {run}',
+            'text': 'Текст',
+            'slug': f'bench-new-{run}',
+        })
+    data = {'q': 'заметка'} if url == reverse('notes:search') else None
+    return client.get(url, data)
+
+
+@pytest.mark.parametrize('name, method, needs_slug', ROUTES)
+def test_route_budget(
+    bench_client, bench_author, budgets, name, method, needs_slug
+):
+    args = None
+    if needs_slug:
+        args = (bench_author.note_set.order_by('id').first().slug,)
+    url = reverse(name, args=args)
+    timings = []
+    query_counts = []
+    if method == 'get':
+        # Разовая работа первого открытия (например, отрисовка HTML
+        # заметки после seed_notes) в бюджет не входит.
+        make_request(bench_client, method, url, -1, bench_author)
+    for run in range(RUNS):
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            response = make_request(
+                bench_client, method, url, run, bench_author
+            )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((perf_counter() - started) * 1000)
+        assert response.status_code < 400, response.status_code
+        if name == 'notes:add' and method == 'post':
+            # Форма с ошибками отвечает 200: замер был бы не того пути.
+            assert response.status_code == HTTPStatus.FOUND
+        query_counts.append(len(queries))
+    route = f'{name} {method.upper()}'
+    result = {'queries': max(query_counts), 'ms': median(timings)}
+    saved, measured = budgets
+    measured[route] = result
+    if os.getenv('BENCH_UPDATE_BUDGETS'):
+        return
+    if saved is None:
+        # Без бюджетов проверка ничего бы не проверяла: это ошибка.
+        pytest.fail(
+            'Для этого масштаба бюджеты не сохранены, запишите их с '
+            'BENCH_UPDATE_BUDGETS=1.'
+        )
+    budget = saved.get(route)
+    assert budget is not None, f'Нет бюджета для {route}'
+    assert result['queries'] <= budget['queries'], (
+        f'{route}: {result["queries"]} запросов, бюджет {budget["queries"]}'
+    )
+    assert result['ms'] <= budget['ms'], (
+        f'{route}: {result["ms"]:.1f} мс, бюджет {budget["ms"]} мс'
+    )
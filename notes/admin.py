@@ -1,5 +1,45 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
 
+from . import search
 from .models import Note
 
-admin.site.register(Note)
+ADMIN_SEARCH_LIMIT = 1000
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Пагинатор без COUNT(*) по всей таблице: считает не больше max_count
+    строк. На больших таблицах список страниц обрывается на max_count,
+    дальше помогают поиск и сортировка.
+    """
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.max_count].count()
+
+
+@admin.register(Note)
+class NoteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'slug', 'author', 'updated_at')
+    list_select_related = ('author',)
+    # Точные совпадения идут по уникальным индексам, текст ищется через
+    # FTS5 (см. get_search_results).
+    search_fields = ('=slug', '=author__username', 'title')
+    raw_id_fields = ('author',)
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        ids = search.matching_ids(term, ADMIN_SEARCH_LIMIT)
+        return queryset.filter(
+            Q(slug=term) | Q(author__username=term) | Q(pk__in=ids)
+        ), False
@@ -0,0 +1,380 @@
+"""
+JSON API для заметок текущего пользователя.
+
+Параметр ?fields=id,slug,title ограничивает набор полей: лишние
+столбцы, например объёмный text, не читаются из базы вовсе.
+"""
+import json
+from http import HTTPStatus
+
+from django.core.exceptions import BadRequest, PermissionDenied
+from django.db import connection, transaction
+from django.db.models import Q
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms.models import model_to_dict
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+
+from . import changes, stats
+from .fields import CompressedValue, decompress
+from .forms import NoteForm
+from .models import Note
+from .signals import notes_bulk_deleted, notes_bulk_saved
+from .views import MAX_ID, NoteBase
+
+API_FIELDS = ('id', 'slug', 'title', 'preview', 'text', 'updated_at')
+CHUNK_SIZE = 500
+BULK_LIMIT = 1000
+# Массовое изменение меняет только заголовок и текст, slug остаётся.
+BULK_UPDATE_FIELDS = ('title', 'text')
+# Что нужно обработчикам удаления: slug — надгробию в ленте изменений,
+# text_bytes — статистике автора.
+DELETE_FIELDS = ('id', 'author', 'slug', 'text_bytes')
+
+
+class NotesJSONEncoder(DjangoJSONEncoder):
+    """Распаковывает сжатый text, пришедший из values()."""
+
+    def default(self, o):
+        if isinstance(o, CompressedValue):
+            return decompress(o)
+        return super().default(o)
+
+
+def dumps(data):
+    return json.dumps(data, cls=NotesJSONEncoder, ensure_ascii=False)
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return HttpResponse(
+        dumps(data), status=status, content_type='application/json'
+    )
+
+
+def error_response(message, status):
+    return json_response({'errors': {'__all__': [message]}}, status)
+
+
+def stream_list(rows):
+    """Отдаёт JSON-массив по одной записи, не собирая его в памяти."""
+    yield '['
+    for number, row in enumerate(rows):
+        yield (',' if number else '') + dumps(row)
+    yield ']'
+
+
+class NoteApiBase(NoteBase, View):
+    """Общая часть API: JSON вместо редиректов и выбор полей."""
+    raise_exception = True
+
+    def dispatch(self, request, *args, **kwargs):
+        # Ошибки запроса — JSON-ом, как и ошибки валидации, а не
+        # HTML-страницами Django.
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except BadRequest as error:
+            return error_response(
+                str(error) or 'Некорректный запрос.', HTTPStatus.BAD_REQUEST
+            )
+        except PermissionDenied as error:
+            return error_response(
+                str(error) or 'Доступ запрещён.', HTTPStatus.FORBIDDEN
+            )
+        except Http404 as error:
+            return error_response(
+                str(error) or 'Не найдено.', HTTPStatus.NOT_FOUND
+            )
+
+    def get_fields(self):
+        fields = self.request.GET.get('fields')
+        if not fields:
+            return API_FIELDS
+        # Пустые элементы (?fields=id,slug,) пропускаются.
+        fields = tuple(filter(None, (
+            field.strip() for field in fields.split(',')
+        )))
+        if not fields:
+            return API_FIELDS
+        unknown = set(fields) - set(API_FIELDS)
+        if unknown:
+            raise BadRequest(
+                'Неизвестные поля: ' + ', '.join(sorted(unknown))
+            )
+        return fields
+
+    def get_data(self):
+        """Данные запроса: JSON в теле или обычная форма."""
+        if self.request.content_type != 'application/json':
+            return self.request.POST
+        try:
+            data = json.loads(self.request.body or '{}')
+        except ValueError:
+            raise BadRequest('Тело запроса не является JSON.')
+        if not isinstance(data, dict):
+            raise BadRequest('Ожидается JSON-объект.')
+        return data
+
+    def note_response(self, note, status=HTTPStatus.OK):
+        data = {field: getattr(note, field) for field in self.get_fields()}
+        return json_response(data, status)
+
+    def save_form(self, form, status):
+        if form.is_valid():
+            note = form.save_checking_slug()
+            if note is not None:
+                return self.note_response(note, status)
+        return json_response(
+            {'errors': form.errors}, HTTPStatus.BAD_REQUEST
+        )
+
+
+class NoteApiList(NoteApiBase):
+    """Список заметок (GET) и создание новой (POST)."""
+    http_method_names = ('get', 'post')
+
+    def get(self, request):
+        rows = self.get_queryset().order_by('id').values(
+            *self.get_fields()
+        ).iterator(chunk_size=CHUNK_SIZE)
+        return StreamingHttpResponse(
+            stream_list(rows), content_type='application/json'
+        )
+
+    def post(self, request):
+        form = NoteForm(self.get_data(), instance=Note(author=request.user))
+        if form.is_valid():
+            # Повтор создания отдаёт уже созданную заметку с кодом 200.
+            duplicate = form.find_duplicate()
+            if duplicate is not None:
+                return self.note_response(duplicate)
+        return self.save_form(form, HTTPStatus.CREATED)
+
+
+class NoteApiDetail(NoteApiBase):
+    """Чтение, изменение и удаление заметки по slug."""
+    http_method_names = ('get', 'put', 'patch', 'delete')
+
+    def get_object(self, fields=None):
+        queryset = self.get_queryset().filter(slug=self.kwargs['slug'])
+        if fields:
+            queryset = queryset.only(*fields)
+        note = queryset.first()
+        if note is None:
+            raise Http404('Заметка не найдена.')
+        return note
+
+    def get(self, request, slug):
+        return self.note_response(self.get_object(self.get_fields()))
+
+    def put(self, request, slug):
+        form = NoteForm(self.get_data(), instance=self.get_object())
+        return self.save_form(form, HTTPStatus.OK)
+
+    def patch(self, request, slug):
+        note = self.get_object()
+        data = model_to_dict(note, fields=NoteForm._meta.fields)
+        data.update(self.get_data().items())
+        form = NoteForm(data, instance=note)
+        return self.save_form(form, HTTPStatus.OK)
+
+    def delete(self, request, slug):
+        self.get_object(DELETE_FIELDS).delete()
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+
+def is_note_id(value):
+    """Целое число в диапазоне id, но не bool: JSON true — это не id 1."""
+    return (
+        isinstance(value, int) and not isinstance(value, bool)
+        and 0 <= value <= MAX_ID
+    )
+
+
+class NoteApiBulkBase(NoteApiBase):
+    """
+    Массовые операции: заметки выбираются одним запросом по списку id
+    и slug среди заметок пользователя, изменения идут одной транзакцией.
+    """
+    http_method_names = ('post',)
+
+    def get_items(self, key):
+        items = self.get_data().get(key)
+        if not isinstance(items, list) or not items:
+            raise BadRequest(f'Ожидается непустой список {key}.')
+        if len(items) > BULK_LIMIT:
+            raise BadRequest(f'Не больше {BULK_LIMIT} заметок за запрос.')
+        return items
+
+    def get_notes(self, ids, slugs, fields=None):
+        if not all(map(is_note_id, ids)):
+            raise BadRequest('id заметок должны быть числами.')
+        if not all(isinstance(slug, str) for slug in slugs):
+            raise BadRequest('slug заметок должны быть строками.')
+        queryset = self.get_queryset().filter(
+            Q(id__in=ids) | Q(slug__in=slugs)
+        )
+        if fields:
+            queryset = queryset.only(*fields)
+        return list(queryset)
+
+
+class NoteApiBulkDelete(NoteApiBulkBase):
+    """Удаляет заметки по {"ids": [...]} и/или {"slugs": [...]}."""
+
+    def post(self, request):
+        data = self.get_data()
+        ids, slugs = data.get('ids') or [], data.get('slugs') or []
+        if not isinstance(ids, list) or not isinstance(slugs, list):
+            raise BadRequest('ids и slugs должны быть списками.')
+        if len(ids) + len(slugs) > BULK_LIMIT:
+            raise BadRequest(f'Не больше {BULK_LIMIT} заметок за запрос.')
+        notes = self.get_notes(ids, slugs, DELETE_FIELDS)
+        if notes:
+            with transaction.atomic():
+                # Одним запросом, без выборки и post_delete по каждой
+                # заметке; остальное делают обработчики notes_bulk_deleted.
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {Note._meta.db_table} WHERE id IN '
+                        f'({", ".join(["%s"] * len(notes))})',
+                        [note.pk for note in notes]
+                    )
+                notes_bulk_deleted.send(sender=Note, notes=notes)
+        return json_response({'deleted': len(notes)})
+
+
+def key_error(item):
+    """Ошибка в ключе изменения: нужен ровно один из id (число) и slug."""
+    if ('id' in item) == ('slug' in item):
+        return 'Укажите ровно одно из полей id и slug.'
+    if 'id' in item and not is_note_id(item['id']):
+        return 'id заметки должен быть числом.'
+    if 'slug' in item and not isinstance(item['slug'], str):
+        return 'slug заметки должен быть строкой.'
+    return None
+
+
+class NoteApiBulkUpdate(NoteApiBulkBase):
+    """
+    Меняет заголовок и текст заметок:
+    {"notes": [{"id" или "slug": ..., "title": ..., "text": ...}]}.
+    Каждое изменение проверяет NoteForm; при любой ошибке не меняется
+    ничего.
+    """
+
+    def post(self, request):
+        items = self.get_items('notes')
+        if not all(isinstance(item, dict) for item in items):
+            raise BadRequest('Каждое изменение должно быть JSON-объектом.')
+        # Ключи проверяются до запросов к базе.
+        errors = {
+            number: {'__all__': [error]}
+            for number, error in enumerate(map(key_error, items)) if error
+        }
+        if errors:
+            return json_response({'errors': errors}, HTTPStatus.BAD_REQUEST)
+        notes = self.get_notes(
+            [item['id'] for item in items if 'id' in item],
+            [item['slug'] for item in items if 'id' not in item],
+        )
+        by_id = {note.id: note for note in notes}
+        by_slug = {note.slug: note for note in notes}
+        changed, seen = {}, {}
+        for number, item in enumerate(items):
+            note = (
+                by_id.get(item['id']) if 'id' in item
+                else by_slug.get(item['slug'])
+            )
+            if note is None:
+                errors[number] = {'__all__': ['Заметка не найдена.']}
+                continue
+            # Два изменения одной заметки (по id и slug тоже) — ошибка,
+            # а не молчаливая победа последнего.
+            if note.id in seen:
+                errors[number] = {'__all__': [
+                    f'Заметка уже изменяется в элементе {seen[note.id]}.'
+                ]}
+                continue
+            seen[note.id] = number
+            data = model_to_dict(note, fields=NoteForm._meta.fields)
+            data.update(
+                (field, item[field])
+                for field in BULK_UPDATE_FIELDS if field in item
+            )
+            form = NoteForm(data, instance=note, check_quota=False)
+            if not form.is_valid():
+                errors[number] = form.errors
+                continue
+            changed[note.id] = note
+        if errors:
+            return json_response({'errors': errors}, HTTPStatus.BAD_REQUEST)
+        notes = list(changed.values())
+        now = timezone.now()
+        for note in notes:
+            note.refresh_derived_fields()
+            note.updated_at = now
+        error = stats.check_quota(request.user.pk, size=sum(
+            note.text_bytes - note.stored_text_bytes for note in notes
+        ))
+        if error:
+            return error_response(error, HTTPStatus.BAD_REQUEST)
+        with transaction.atomic():
+            Note.objects.bulk_update(notes, (
+                *BULK_UPDATE_FIELDS, 'updated_at', *Note.derived_fields
+            ))
+            notes_bulk_saved.send(sender=Note, notes=notes)
+        return json_response({'updated': len(notes)})
+
+
+class NoteChanges(NoteApiBase):
+    """
+    Изменения заметок после курсора ?since=. Ответ: изменения по
+    возрастанию seq, новый курсор и признак has_more; удалённые заметки
+    приходят с deleted=true.
+    """
+    http_method_names = ('get',)
+
+    def get_since(self):
+        try:
+            since = int(self.request.GET.get('since', 0))
+        except ValueError:
+            raise BadRequest('Параметр since должен быть числом.')
+        if not 0 <= since <= MAX_ID:
+            raise BadRequest('Параметр since вне допустимого диапазона.')
+        return since
+
+    def get(self, request):
+        since = self.get_since()
+        if changes.is_expired(request.user, since):
+            return json_response(
+                {'error': 'История изменений сжата, начните с since=0.'},
+                HTTPStatus.GONE,
+            )
+        fields = self.get_fields()
+        rows, has_more = changes.feed(request.user, since)
+        notes = {
+            note['id']: note
+            for note in self.get_queryset().filter(
+                id__in=[row.note_id for row in rows if not row.deleted]
+            ).values(*{*fields, 'id'})
+        }
+        items = []
+        for row in rows:
+            item = {
+                'seq': row.id, 'id': row.note_id, 'slug': row.slug,
+                'deleted': row.deleted,
+            }
+            if not row.deleted:
+                note = notes.get(row.note_id)
+                if note is None:
+                    # Заметку удалили после чтения ленты: её надгробие
+                    # придёт при следующем запросе.
+                    continue
+                item['note'] = {field: note[field] for field in fields}
+            items.append(item)
+        return json_response({
+            'changes': items,
+            'cursor': rows[-1].id if rows else since,
+            'has_more': has_more,
+        })
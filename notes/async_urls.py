@@ -0,0 +1,20 @@
+"""
+Маршруты приложения для ASGI: страницы чтения и чтение через API
+заменены асинхронными версиями, остальное берётся из notes.urls.
+"""
+from django.urls import path
+
+from notes import async_views, urls
+
+app_name = 'notes'
+
+urlpatterns = [
+    path('note/<slug:slug>/', async_views.note_detail, name='detail'),
+    path('notes/', async_views.notes_list, name='list'),
+    path('api/notes/', async_views.api_list, name='api-list'),
+    path(
+        'api/notes/<slug:slug>/',
+        async_views.api_detail,
+        name='api-detail',
+    ),
+] + urls.urlpatterns
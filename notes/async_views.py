@@ -0,0 +1,152 @@
+"""
+Асинхронные версии страниц чтения для развёртывания через ASGI.
+
+В Django 3.2 у ORM ещё нет асинхронных методов (aget, aiterator появились
+в 4.1), поэтому обращения к базе и отрисовка шаблонов выполняются явными
+переходами через sync_to_async. Всё, что обходится без базы, — проверка
+ETag списка и выдача страницы из кэша — остаётся в цикле событий и не
+занимает поток. Логика выборки, кэша и условного GET берётся у
+синхронных представлений, чтобы ответы совпадали.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import api
+from .views import CachedPageMixin, NoteDetail, NotesList
+
+
+async def is_authenticated(request):
+    """Загружает request.user вне цикла событий: нужны сессия и база."""
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+def async_login_required(raise_exception=False):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not await is_authenticated(request):
+                if raise_exception:
+                    raise PermissionDenied
+                return redirect_to_login(request.get_full_path())
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sync_fallback(sync_view):
+    """Чтение обслуживается асинхронно, запись — синхронным представлением."""
+    sync_view = sync_to_async(sync_view)
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_view(request, *args, **kwargs)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_page(view, request, kwargs):
+    """Промах кэша: обычная отрисовка синхронным представлением."""
+    response = super(CachedPageMixin, view).get(request, **kwargs)
+    return view.cache_response(response)
+
+
+def get_validators(view, request, kwargs):
+    return (
+        view.get_etag(request, **kwargs),
+        view.get_last_modified(request, **kwargs),
+    )
+
+
+async def serve_page(view_class, request, validators_need_db, **kwargs):
+    """Условный GET и кэш страниц так же, как у синхронной версии."""
+    view = view_class()
+    view.setup(request, **kwargs)
+    if validators_need_db:
+        etag, last_modified = await sync_to_async(get_validators)(
+            view, request, kwargs
+        )
+    else:
+        etag, last_modified = get_validators(view, request, kwargs)
+    etag = quote_etag(etag) if etag is not None else None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = view.get_cached_response()
+    if response is None:
+        response = await sync_to_async(render_page)(view, request, kwargs)
+    if timestamp and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(timestamp)
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    return response
+
+
+@sync_fallback(NotesList.as_view())
+@async_login_required()
+async def notes_list(request):
+    # ETag списка строится по версии в кэше, база для него не нужна.
+    return await serve_page(NotesList, request, validators_need_db=False)
+
+
+@sync_fallback(NoteDetail.as_view())
+@async_login_required()
+async def note_detail(request, slug):
+    return await serve_page(
+        NoteDetail, request, validators_need_db=True, slug=slug
+    )
+
+
+def fetch_rows(view, fields, after):
+    return list(
+        view.get_queryset().filter(id__gt=after).order_by('id').values(
+            *fields
+        )[:api.CHUNK_SIZE]
+    )
+
+
+@sync_fallback(api.NoteApiList.as_view())
+@async_login_required(raise_exception=True)
+async def api_list(request):
+    """
+    Список заметок для API. Django 3.2 под ASGI перебирает
+    StreamingHttpResponse прямо в цикле событий, где запросы к базе
+    запрещены, поэтому ответ собирается пачками по CHUNK_SIZE.
+    """
+    view = api.NoteApiList()
+    view.setup(request)
+    fields = view.get_fields()
+    # id нужен как курсор, даже если клиент его не запрашивал.
+    query_fields = fields if 'id' in fields else fields + ('id',)
+    parts = []
+    after = 0
+    while True:
+        rows = await sync_to_async(fetch_rows)(view, query_fields, after)
+        if not rows:
+            break
+        after = rows[-1]['id']
+        parts.extend(
+            api.dumps({field: row[field] for field in fields})
+            for row in rows
+        )
+    return HttpResponse(
+        '[' + ','.join(parts) + ']', content_type='application/json'
+    )
+
+
+@sync_fallback(api.NoteApiDetail.as_view())
+@async_login_required(raise_exception=True)
+async def api_detail(request, slug):
+    view = api.NoteApiDetail()
+    view.setup(request, slug=slug)
+    return await sync_to_async(view.get)(request, slug)
@@ -0,0 +1,15 @@
+from django.contrib.auth.backends import ModelBackend
+
+from . import caching
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кэша."""
+
+    def get_user(self, user_id):
+        user = caching.get_user(user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                caching.set_user(user)
+        return user
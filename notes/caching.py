@@ -0,0 +1,133 @@
+"""
+Кэш отрисованных страниц заметок.
+
+У каждого автора есть версия в кэше: любое изменение его заметок
+выдаёт новую версию, и старые записи больше никогда не читаются.
+"""
+from hashlib import md5
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+HITS_KEY = 'notes:cache:hits'
+MISSES_KEY = 'notes:cache:misses'
+
+
+def get_cache():
+    return caches[settings.NOTES_CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'notes:author:{user_id}:version'
+
+
+def _changed_key(user_id):
+    return f'notes:author:{user_id}:changed'
+
+
+def get_version(user_id):
+    """Текущая версия заметок автора; создаётся при первом обращении."""
+    cache = get_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = uuid4().hex
+        if not cache.add(_version_key(user_id), version, None):
+            version = cache.get(_version_key(user_id), version)
+    return version
+
+
+def _set_version(user_id):
+    get_cache().set_many({
+        _version_key(user_id): uuid4().hex,
+        _changed_key(user_id): timezone.now(),
+    }, None)
+
+
+def bump_version(user_id):
+    """
+    Делает недействительными все страницы автора: сразу и ещё раз после
+    фиксации транзакции. Иначе параллельный запрос, прочитавший старые
+    данные до фиксации, сохранил бы их в кэше под новой версией, и по
+    её ETag клиенты получали бы 304 до следующей записи.
+    """
+    _set_version(user_id)
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _set_version(user_id))
+
+
+def get_last_changed(user_id):
+    """
+    Момент последнего изменения заметок автора.
+
+    Если отметку вытеснили из кэша, считаем, что изменения были только что:
+    клиент один раз получит страницу целиком.
+    """
+    cache = get_cache()
+    changed = cache.get(_changed_key(user_id))
+    if changed is None:
+        changed = timezone.now()
+        if not cache.add(_changed_key(user_id), changed, None):
+            changed = cache.get(_changed_key(user_id), changed)
+    return changed
+
+
+def page_key(user_id, path):
+    path_hash = md5(path.encode()).hexdigest()
+    return f'notes:page:{user_id}:{get_version(user_id)}:{path_hash}'
+
+
+def _user_key(user_id):
+    return f'notes:user:{user_id}'
+
+
+def get_user(user_id):
+    return get_cache().get(_user_key(user_id))
+
+
+def set_user(user):
+    get_cache().set(
+        _user_key(user.pk), user, settings.AUTH_USER_CACHE_TIMEOUT
+    )
+
+
+def forget_user(user_id):
+    get_cache().delete(_user_key(user_id))
+
+
+def _increment(key):
+    cache = get_cache()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Счётчик вытеснили между add и incr: начинаем заново.
+        cache.set(key, 1, None)
+
+
+def record_hit():
+    _increment(HITS_KEY)
+
+
+def record_miss():
+    _increment(MISSES_KEY)
+
+
+def get_stats():
+    """Счётчики попаданий и промахов кэша страниц."""
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many((HITS_KEY, MISSES_KEY))
@@ -0,0 +1,96 @@
+"""
+Лента изменений заметок для синхронизации клиентов.
+
+Клиент хранит номер последнего полученного изменения и запрашивает только
+то, что случилось после него. Номера строго растут: SQLite выдаёт id с
+AUTOINCREMENT, а запись в базу идёт по одной транзакции за раз.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .models import ChangeHorizon, Note, NoteChange
+
+CHANGES_LIMIT = 500
+
+
+def record(notes, deleted=False):
+    """Заменяет строки ленты для переданных заметок новыми."""
+    rows = [
+        NoteChange(
+            author_id=note.author_id, note_id=note.pk, slug=note.slug,
+            deleted=deleted,
+        )
+        for note in notes
+    ]
+    if not rows:
+        return
+    # Без точки сохранения: при ошибке откатится вся внешняя транзакция.
+    with transaction.atomic(savepoint=False):
+        NoteChange.objects.filter(
+            note_id__in=[row.note_id for row in rows]
+        ).delete()
+        NoteChange.objects.bulk_create(rows)
+
+
+def backfill():
+    """
+    Добавляет в ленту заметки, записанные в обход сигналов, например
+    seed_notes. Возвращает число добавленных строк.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {NoteChange._meta.db_table} '
+            '(author_id, note_id, slug, deleted, changed_at) '
+            'SELECT author_id, id, slug, %s, updated_at '
+            f'FROM {Note._meta.db_table} n WHERE NOT EXISTS ('
+            f'SELECT 1 FROM {NoteChange._meta.db_table} c '
+            'WHERE c.note_id = n.id) ORDER BY n.id',
+            [False]
+        )
+        return cursor.rowcount
+
+
+def feed(user, since, limit=CHANGES_LIMIT):
+    """Изменения автора после since и признак, что есть ещё."""
+    rows = list(NoteChange.objects.filter(
+        author=user, id__gt=since
+    ).order_by('id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def is_expired(user, since):
+    """
+    Клиент мог пропустить удалённые при сжатии надгробия и должен начать
+    заново с since=0: в ленте всегда есть строка каждой живой заметки.
+    """
+    return since > 0 and ChangeHorizon.objects.filter(
+        author=user, seq__gt=since
+    ).exists()
+
+
+def compact(before):
+    """Удаляет надгробия старше before, возвращает их число."""
+    tombstones = NoteChange.objects.filter(
+        deleted=True, changed_at__lt=before
+    )
+    with transaction.atomic():
+        horizons = dict(
+            tombstones.values_list('author').annotate(seq=Max('id'))
+        )
+        # У NoteChange.author нет ограничения в базе: надгробия удалённого
+        # пользователя остаются, а горизонт для него записать нельзя.
+        existing = get_user_model().objects.filter(
+            pk__in=horizons
+        ).values_list('pk', flat=True)
+        for author_id in existing:
+            ChangeHorizon.objects.update_or_create(
+                author_id=author_id, defaults={'seq': horizons[author_id]}
+            )
+        deleted, _ = tombstones.delete()
+    return deleted
+
+
+def forget_author(author_id):
+    """Удаляет ленту удалённого пользователя: клиентов у неё больше нет."""
+    NoteChange.objects.filter(author_id=author_id).delete()
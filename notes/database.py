@@ -0,0 +1,18 @@
+"""Настройка соединений с базой данных."""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(connection):
+    """
+    Выставляет прагмы из SQLITE_PRAGMAS новому соединению SQLite.
+
+    Прагмы действуют только на текущее соединение, поэтому их нужно
+    повторять при каждом подключении; journal_mode=wal сохраняется в
+    самом файле базы.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
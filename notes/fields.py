@@ -0,0 +1,94 @@
+"""
+Текстовое поле со сжатием больших значений.
+
+Тексты длиннее NOTES_COMPRESS_THRESHOLD символов хранятся в базе сжатыми
+zlib, в base64 и с префиксом MARKER. Из базы значение приходит сжатым и
+распаковывается при первом обращении к атрибуту модели, так что списки
+и страницы, которым текст не нужен, его не распаковывают. Индекс поиска
+хранит свою копию текстов несжатой.
+"""
+import zlib
+from base64 import b64decode, b64encode
+
+from django.conf import settings
+from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+
+MARKER = 'zlib:'
+DEFAULT_THRESHOLD = 4096
+
+
+class CompressedValue:
+    """Сжатое значение, прочитанное из базы и ещё не распакованное."""
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __repr__(self):
+        return f'<CompressedValue: {len(self.raw)} символов>'
+
+
+def compress(text):
+    """Сжимает текст; короткие тексты, которым сжатие не помогает, — нет."""
+    threshold = getattr(
+        settings, 'NOTES_COMPRESS_THRESHOLD', DEFAULT_THRESHOLD
+    )
+    # Текст, случайно начинающийся с MARKER, сжимаем всегда, иначе при
+    # чтении его нельзя было бы отличить от сжатого.
+    if len(text) <= threshold and not text.startswith(MARKER):
+        return text
+    packed = MARKER + b64encode(
+        zlib.compress(text.encode(), 6)
+    ).decode('ascii')
+    if len(packed) >= len(text) and not text.startswith(MARKER):
+        return text
+    return packed
+
+
+def decompress(value):
+    """Исходный текст для значения из базы, в том числе из values()."""
+    if not isinstance(value, CompressedValue):
+        return value
+    try:
+        return zlib.decompress(
+            b64decode(value.raw[len(MARKER):], validate=True)
+        ).decode()
+    except (ValueError, zlib.error):
+        # Текст, записанный до сжатия и просто начинающийся с MARKER.
+        return value.raw
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """
+    Распаковывает значение при первом чтении атрибута. В отличие от
+    DeferredAttribute определяет __set__, иначе значение из __dict__
+    экземпляра читалось бы в обход дескриптора.
+    """
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+    def __get__(self, instance, cls=None):
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedValue):
+            value = decompress(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+
+class CompressedTextField(models.TextField):
+    descriptor_class = CompressedTextDescriptor
+
+    def from_db_value(self, value, expression, connection):
+        if value is not None and value.startswith(MARKER):
+            return CompressedValue(value)
+        return value
+
+    def get_db_prep_save(self, value, connection):
+        # Только при записи: в условиях фильтров текст сравнивается как есть.
+        if isinstance(value, CompressedValue):
+            return value.raw
+        if isinstance(value, str):
+            value = compress(value)
+        return super().get_db_prep_save(value, connection)
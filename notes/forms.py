@@ -1,29 +1,112 @@
-from pytils.translit import slugify
-
 from django import forms
-from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 
-from .models import Note
+from . import slugs, stats, tags
+from .models import Note, Tag, content_hash, text_size
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
 
 class NoteForm(forms.ModelForm):
     """Форма для создания или обновления заметки."""
+    tags = forms.CharField(
+        label='Теги', required=False, help_text='Через запятую.'
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
-    def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
+    def __init__(self, *args, check_quota=True, **kwargs):
+        """
+        С check_quota=False квоту автора проверяет вызывающий код, например
+        массовое изменение — одним запросом на все заметки.
+        """
+        super().__init__(*args, **kwargs)
+        self.check_quota = check_quota
+        if not self.is_bound and self.instance.pk:
+            self.initial['tags'] = tags.join(
+                tags.note_tag_names(self.instance)
+            )
+
+    def clean_tags(self):
+        names = tags.parse(self.cleaned_data['tags'])
+        if len(names) > tags.MAX_TAGS:
+            raise forms.ValidationError(
+                f'Не больше {tags.MAX_TAGS} тегов у заметки.'
+            )
+        max_length = Tag._meta.get_field('name').max_length
+        for name in names:
+            if len(name) > max_length:
+                raise forms.ValidationError(
+                    f'Тег «{name}» длиннее {max_length} символов.'
+                )
+        return names
+
+    def clean(self):
         cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
-            raise ValidationError(slug + WARNING)
-        return slug
+        text = cleaned_data.get('text')
+        author_id = self.instance.author_id
+        if self.check_quota and text is not None and author_id is not None:
+            # Экземпляр ещё не изменён формой: text_bytes — размер в базе.
+            adding = self.instance._state.adding
+            error = stats.check_quota(
+                author_id,
+                notes=int(adding),
+                size=text_size(text) - (
+                    0 if adding else self.instance.text_bytes
+                ),
+            )
+            if error:
+                raise forms.ValidationError(error)
+        return cleaned_data
+
+    def find_duplicate(self):
+        """
+        Заметка автора с тем же заголовком и текстом, что в форме, или
+        None. Вызывается для проверенной формы.
+        """
+        return Note.objects.filter(
+            author_id=self.instance.author_id,
+            content_hash=content_hash(
+                self.cleaned_data['title'], self.cleaned_data['text']
+            ),
+        ).exclude(pk=self.instance.pk).first()
+
+    def save(self, commit=True):
+        note = super().save(commit)
+        # Теги меняются, только если их передали: запросы API без поля
+        # tags оставляют их как есть.
+        if commit and 'tags' in self.data:
+            tags.set_note_tags(note, self.cleaned_data['tags'])
+        return note
+
+    def clean_slug(self):
+        """
+        Уникальность slug проверяет индекс в базе при сохранении, без
+        отдельного запроса; пустой slug модель создаст из заголовка.
+        """
+        return self.cleaned_data.get('slug', '')
+
+    def validate_unique(self):
+        exclude = set(self._get_validation_exclusions())
+        exclude.add('slug')
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except forms.ValidationError as error:
+            self._update_errors(error)
+
+    def save_checking_slug(self):
+        """
+        Сохраняет заметку. Занятый slug обнаруживает уникальный индекс:
+        тогда в форму добавляется ошибка и возвращается None.
+        """
+        try:
+            with transaction.atomic():
+                return self.save()
+        except IntegrityError:
+            slug = self.instance.slug
+            if not slugs.is_taken(slug, exclude_pk=self.instance.pk):
+                raise
+            self.add_error('slug', slug + WARNING)
+            return None
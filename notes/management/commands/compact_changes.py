@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from notes import changes
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из ленты изменений старые надгробия удалённых заметок. '
+        'Клиентам, которые не синхронизировались дольше, лента ответит 410 '
+        'и предложит начать синхронизацию заново.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=30,
+            help='Сколько дней хранить надгробия.'
+        )
+
+    def handle(self, *args, **options):
+        deleted = changes.compact(
+            timezone.now() - timedelta(days=options['days'])
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено надгробий: {deleted}'
+        ))
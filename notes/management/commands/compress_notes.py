@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models.functions import Length
+
+from notes.fields import MARKER, compress
+from notes.models import Note
+from notes.search import FTS_TABLE
+
+
+def database_size():
+    """Размер файла SQLite в байтах; для других СУБД — None."""
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA page_count')
+        page_count = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        return page_count * cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сжимает тексты существующих заметок длиннее '
+        'NOTES_COMPRESS_THRESHOLD и показывает, сколько места освобождено. '
+        f'Копию текстов в индексе поиска {FTS_TABLE} сжатие не трогает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Сколько заметок сжимать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help='Выполнить VACUUM, чтобы файл SQLite уменьшился.'
+        )
+
+    def handle(self, *args, **options):
+        # Фильтры по text не проходят через сжатие: выбираем строки,
+        # которые хранятся как есть и длиннее порога.
+        queryset = Note.objects.annotate(size=Length('text')).filter(
+            size__gt=settings.NOTES_COMPRESS_THRESHOLD
+        ).exclude(text__startswith=MARKER).order_by('id')
+        last_id = 0
+        compressed = before = after = 0
+        file_before = database_size()
+        while True:
+            batch = list(queryset.filter(id__gt=last_id).values_list(
+                'id', 'text'
+            )[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            updates = []
+            for note_id, text in batch:
+                packed = compress(text)
+                if not packed.startswith(MARKER):
+                    continue
+                updates.append((packed, note_id))
+                before += len(text.encode())
+                after += len(packed)
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Прямой UPDATE: текст по смыслу не меняется, поэтому
+                # ни updated_at, ни сигналы сохранения не нужны.
+                cursor.executemany(
+                    f'UPDATE {Note._meta.db_table} SET text = %s '
+                    'WHERE id = %s',
+                    updates
+                )
+            compressed += len(updates)
+            self.stdout.write(f'Сжато заметок: {compressed}')
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+        self.stdout.write(self.style.SUCCESS(
+            f'Сжато заметок: {compressed}, было {before} байт, '
+            f'стало {after}, освобождено {before - after}'
+        ))
+        if file_before is None:
+            return
+        # Выше — только столбец text. Индекс FTS5 хранит свою несжатую
+        # копию текстов, а без VACUUM файл не уменьшается вовсе.
+        self.stdout.write(
+            f'Файл базы: было {file_before} байт, стало {database_size()}'
+        )
+        self.stdout.write(self.style.WARNING(
+            f'Индекс поиска {FTS_TABLE} хранит несжатую копию текстов, '
+            'её сжатие не уменьшает.'
+        ))
+        if not options['vacuum']:
+            self.stdout.write(self.style.WARNING(
+                'Освободившееся место останется в файле; '
+                'чтобы его вернуть, запустите команду с --vacuum.'
+            ))
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from notes.fields import decompress
+from notes.models import Note
+
+EXPORT_FIELDS = ('title', 'text', 'slug', 'author__username')
+
+
+class Command(BaseCommand):
+    help = 'Выгружает заметки в формате JSONL, по одной заметке на строку.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки; по умолчанию стандартный вывод.'
+        )
+        parser.add_argument(
+            '--author',
+            help='Выгрузить заметки только этого пользователя.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за один раз.'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Note.objects.order_by('id').values(*EXPORT_FIELDS)
+        if options['author']:
+            queryset = queryset.filter(author__username=options['author'])
+        if options['output'] == '-':
+            exported = self.export(queryset, self.stdout, options)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                exported = self.export(queryset, output, options)
+        self.stderr.write(f'Выгружено заметок: {exported}')
+
+    def export(self, queryset, output, options):
+        exported = 0
+        for row in queryset.iterator(chunk_size=options['chunk_size']):
+            row['author'] = row.pop('author__username')
+            row['text'] = decompress(row['text'])
+            output.write(json.dumps(row, ensure_ascii=False) + '\n')
+            exported += 1
+        return exported
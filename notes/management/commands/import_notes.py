@@ -0,0 +1,184 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_slug
+from django.db import transaction
+
+from notes import slugs
+from notes.models import Note
+from notes.signals import notes_bulk_saved
+
+User = get_user_model()
+
+
+# Поля записи и их наибольшая длина; None — без ограничения.
+FIELDS = {
+    'title': Note._meta.get_field('title').max_length,
+    'slug': Note._meta.get_field('slug').max_length,
+    'text': None,
+    'author': None,
+}
+
+
+def field_error(record):
+    """
+    Ошибка в полях записи или None. SQLite не проверяет длину строк,
+    поэтому слишком длинные значения отсекаются здесь.
+    """
+    for field, max_length in FIELDS.items():
+        value = record.get(field)
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            return f'поле {field} должно быть строкой.'
+        if max_length is not None and len(value) > max_length:
+            return f'поле {field} длиннее {max_length} символов.'
+    slug = record.get('slug')
+    if slug:
+        # Те же правила, что у поля Note.slug: иначе адреса заметки не
+        # разберёт маршрут <slug:slug>.
+        try:
+            validate_slug(slug)
+        except ValidationError:
+            return f'некорректный slug {slug!r}.'
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает заметки из JSONL пачками через bulk_create. '
+        'Файл читается построчно, поэтому память не зависит от его размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл JSONL; «-» — стандартный ввод.'
+        )
+        parser.add_argument(
+            '--author',
+            help='Записать все заметки этому пользователю.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько заметок вставлять одним запросом.'
+        )
+
+    def handle(self, *args, **options):
+        self.author_ids = {}
+        self.skipped = 0
+        self.duplicates = 0
+        self.imported = 0
+        if options['author']:
+            self.default_author = self.get_author_id(options['author'])
+            if self.default_author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден.'
+                )
+        else:
+            self.default_author = None
+        if options['path'] == '-':
+            self.load(sys.stdin, options['batch_size'])
+        else:
+            with open(options['path'], encoding='utf-8') as source:
+                self.load(source, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено заметок: {self.imported}, '
+            f'пропущено строк: {self.skipped}, дублей: {self.duplicates}'
+        ))
+
+    def get_author_id(self, username):
+        if username not in self.author_ids:
+            self.author_ids[username] = User.objects.filter(
+                username=username
+            ).values_list('id', flat=True).first()
+        return self.author_ids[username]
+
+    def load(self, source, batch_size):
+        batch = []
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            note = self.build_note(line_number, line)
+            if note is None:
+                self.skipped += 1
+                continue
+            batch.append(note)
+            if len(batch) >= batch_size:
+                self.write_batch(batch)
+                batch = []
+        if batch:
+            self.write_batch(batch)
+
+    def build_note(self, line_number, line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            self.stderr.write(f'Строка {line_number}: некорректный JSON.')
+            return None
+        if not isinstance(record, dict):
+            self.stderr.write(
+                f'Строка {line_number}: ожидается JSON-объект.'
+            )
+            return None
+        error = field_error(record)
+        if error:
+            self.stderr.write(f'Строка {line_number}: {error}')
+            return None
+        author_id = self.default_author or self.get_author_id(
+            record.get('author')
+        )
+        if author_id is None:
+            self.stderr.write(
+                f'Строка {line_number}: неизвестный автор '
+                f'{record.get("author")}.'
+            )
+            return None
+        note = Note(
+            title=record.get('title') or '',
+            text=record.get('text') or '',
+            slug=record.get('slug') or '',
+            author_id=author_id,
+        )
+        note.refresh_derived_fields()
+        return note
+
+    def drop_duplicates(self, batch):
+        """
+        Убирает заметки, которые у автора уже есть, и повторы внутри
+        пачки, так что повторный импорт файла ничего не добавляет.
+        Сравниваются хеши содержимого по индексу, а не тексты.
+        """
+        seen = set(Note.objects.filter(
+            author_id__in={note.author_id for note in batch},
+            content_hash__in={note.content_hash for note in batch},
+        ).values_list('author_id', 'content_hash'))
+        unique = []
+        for note in batch:
+            key = (note.author_id, note.content_hash)
+            if key in seen:
+                self.duplicates += 1
+                continue
+            seen.add(key)
+            unique.append(note)
+        return unique
+
+    def write_batch(self, batch):
+        batch = self.drop_duplicates(batch)
+        if not batch:
+            return
+        slugs.reserve_slugs(batch)
+        with transaction.atomic():
+            Note.objects.bulk_create(batch)
+            if batch[0].pk is None:
+                # SQLite не возвращает id из bulk_create: достаём их по slug.
+                ids = dict(Note.objects.filter(
+                    slug__in=[note.slug for note in batch]
+                ).values_list('slug', 'id'))
+                for note in batch:
+                    note.pk = ids[note.slug]
+            notes_bulk_saved.send(sender=Note, notes=batch, created=True)
+        self.imported += len(batch)
+        self.stdout.write(f'Загружено заметок: {self.imported}')
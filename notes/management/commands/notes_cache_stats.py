@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from notes import caching
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша страниц заметок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        stats = caching.get_stats()
+        self.stdout.write(
+            'Попаданий: {hits}, промахов: {misses}, '
+            'доля попаданий: {hit_ratio:.1%}'.format(**stats)
+        )
+        if options['reset']:
+            caching.reset_stats()
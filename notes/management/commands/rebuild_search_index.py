@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from notes import search
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс заметок пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько заметок индексировать за один проход.'
+        )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError(
+                'Полнотекстовый поиск доступен только на SQLite.'
+            )
+        batch_size = options['batch_size']
+        search.clear_index()
+        queryset = Note.objects.only(
+            'id', 'author', 'title', 'text'
+        ).order_by('id')
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            search.index_notes(batch)
+            last_id = batch[-1].id
+            total += len(batch)
+            self.stdout.write(f'Проиндексировано заметок: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен, всего заметок: {total}'
+        ))
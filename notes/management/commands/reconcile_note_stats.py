@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from notes import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает статистику заметок пользователей (число, размер '
+        'текстов) по самим заметкам и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько пользователей или заметок пересчитывать за раз.'
+        )
+        parser.add_argument(
+            '--sizes', action='store_true',
+            help='Сначала пересчитать размеры текстов заметок.'
+        )
+
+    def handle(self, *args, **options):
+        if options['sizes']:
+            fixed = stats.refresh_text_sizes(options['batch_size'])
+            self.stdout.write(f'Исправлено размеров заметок: {fixed}')
+        fixed = stats.reconcile_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено строк статистики: {fixed}'
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from notes import markdown
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = (
+        'Отрисовывает HTML заметок, которые ещё не отрисованы или '
+        'отрисованы прежней версией Markdown.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько заметок отрисовывать за один проход.'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перерисовать все заметки, а не только устаревшие.'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Note.objects.only('id', 'text').order_by('id')
+        if not options['all']:
+            queryset = queryset.exclude(
+                html_version=markdown.RENDERER_VERSION
+            )
+        last_id = 0
+        total = 0
+        while True:
+            batch = list(
+                queryset.filter(id__gt=last_id)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            for note in batch:
+                note.refresh_html()
+            # bulk_update не трогает updated_at: текст заметки тот же.
+            Note.objects.bulk_update(batch, ('text_html', 'html_version'))
+            last_id = batch[-1].id
+            total += len(batch)
+            self.stdout.write(f'Отрисовано заметок: {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'HTML обновлён, всего заметок: {total}'
+        ))
@@ -0,0 +1,111 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from notes import tasks
+
+
+def execute_in_thread(kind, batch):
+    try:
+        return tasks.execute(kind, batch)
+    finally:
+        # У каждого потока своё соединение с базой.
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задания над заметками из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help=(
+                'Сколько пачек выполнять параллельно в потоках. Запись в '
+                'SQLite всё равно идёт по одной транзакции, потоки '
+                'помогают долгим вычислениям в обработчиках.'
+            )
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько заданий забирать из очереди за раз.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=300,
+            help='Через сколько секунд вернуть в очередь зависшие задания.'
+        )
+        parser.add_argument(
+            '--stats-interval', type=float, default=60.0,
+            help='Как часто печатать глубину очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться.'
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Только показать глубину очереди.'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.write_stats()
+            return
+        self.workers = options['workers']
+        pool = (
+            ThreadPoolExecutor(self.workers) if self.workers > 1 else None
+        )
+        done = failed = 0
+        stats_at = time.monotonic()
+        try:
+            while True:
+                tasks.requeue_stale(options['stale_after'])
+                batch = tasks.claim(options['batch_size'])
+                if batch:
+                    batch_done, batch_failed = self.run_batch(batch, pool)
+                    done += batch_done
+                    failed += batch_failed
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+                if time.monotonic() - stats_at >= options['stats_interval']:
+                    self.write_stats()
+                    stats_at = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено заданий: {done}, с ошибкой: {failed}'
+        ))
+
+    def run_batch(self, batch, pool):
+        """Выполняет пачку по видам заданий, возвращает число удачных и нет."""
+        groups = tasks.group_by_kind(batch, self.workers)
+        if pool is None:
+            results = [tasks.execute(*group) for group in groups]
+        else:
+            results = list(pool.map(
+                lambda group: execute_in_thread(*group), groups
+            ))
+        done = sum(
+            len(group) for (_, group), ok in zip(groups, results) if ok
+        )
+        return done, len(batch) - done
+
+    def write_stats(self):
+        stats = tasks.queue_stats()
+        self.stdout.write(
+            'В очереди: {pending}, выполняется: {running}, '
+            'с ошибкой: {failed}, старейшее ждёт '
+            '{oldest_pending_seconds:.0f} с'.format(**stats)
+        )
+        for kind, count in sorted(stats['pending_by_kind'].items()):
+            self.stdout.write(f'  {kind}: {count}')
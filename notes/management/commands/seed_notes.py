@@ -0,0 +1,211 @@
+import random
+from functools import partial
+from time import perf_counter
+
+from pytils.translit import slugify
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from notes import changes, stats
+from notes.models import Note
+
+User = get_user_model()
+SLUG_LENGTH = Note._meta.get_field('slug').max_length
+# Поля этих классов передают строки и числа в SQLite без преобразований.
+# Сравнение по точному классу: у наследников может быть своя подготовка.
+PASSTHROUGH_FIELDS = (
+    models.CharField, models.SlugField, models.TextField, models.ForeignKey
+)
+
+WORDS = (
+    'заметка список дела покупки встреча проект отчёт идея план задача '
+    'книга фильм рецепт поездка отпуск работа учёба курс лекция код '
+    'ошибка релиз сервер база данных запрос ответ клиент команда срок '
+    'бюджет счёт оплата договор звонок письмо адрес телефон подарок '
+    'праздник день неделя месяц год утро вечер важно срочно потом '
+    'проверить купить позвонить написать прочитать сделать обсудить '
+    'новый старый большой маленький первый последний общий личный'
+).split()
+CORPUS_WORDS = 200_000
+TITLE_WORDS = (1, 6)
+# Заголовки и тексты выбираются из заранее созданных наборов: генерация
+# на каждую строку стоила бы дороже самой вставки.
+TITLE_POOL = 5_000
+TEXT_POOL = 20_000
+TEXT_LENGTH_MU = 5.5
+TEXT_LENGTH_SIGMA = 1.0
+TEXT_LENGTH_LIMITS = (10, 50_000)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт пользователей и заметки для замеров производительности. '
+        'Данные детерминированы параметром --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--notes', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и slug заметок.'
+        )
+
+    def handle(self, *args, **options):
+        started = perf_counter()
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        titles = make_titles(rng)
+        texts = make_texts(rng)
+        if connection.vendor == 'sqlite':
+            # Большой кэш страниц: вставка идёт в несколько индексов сразу.
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size = -262144')
+        with transaction.atomic():
+            author_ids = self.create_users(prefix, options['users'])
+            inserter = NoteInserter()
+            batch = []
+            for number in range(options['notes']):
+                title, slug = rng.choice(titles)
+                # Квадрат равномерной величины смещает заметки к первым
+                # авторам: несколько активных пользователей и длинный хвост.
+                author_id = author_ids[
+                    int(len(author_ids) * rng.random() ** 2)
+                ]
+                batch.append(inserter.row(
+                    title,
+                    rng.choice(texts),
+                    # Номер с нулями: slug растут монотонно, и уникальный
+                    # индекс дописывается в конец, а не вразнобой.
+                    f'{prefix}-{number:08d}-{slug}'[:SLUG_LENGTH],
+                    author_id,
+                ))
+                if len(batch) == options['batch_size']:
+                    inserter.insert(batch)
+                    batch = []
+            inserter.insert(batch)
+            # Вставка идёт в обход сигналов: ленту изменений дополняем
+            # одним запросом, статистику авторов пересчитываем.
+            changes.backfill()
+            stats.reconcile_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(author_ids)}, '
+            f'заметок: {options["notes"]} '
+            f'за {perf_counter() - started:.1f} с. '
+            'Поисковый индекс обновляет rebuild_search_index, '
+            'HTML заметок — render_notes.'
+        ))
+
+    def create_users(self, prefix, count):
+        # Пароль у всех один и непригодный для входа: хешировать его
+        # для каждого пользователя незачем.
+        password = make_password(None)
+        User.objects.bulk_create(
+            User(username=f'{prefix}-user-{number}', password=password)
+            for number in range(count)
+        )
+        return list(User.objects.filter(
+            username__startswith=f'{prefix}-user-'
+        ).order_by('id').values_list('id', flat=True))
+
+
+def make_titles(rng):
+    """Заголовки из 1–6 слов со slug, переведённым в латиницу один раз."""
+    word_slugs = {word: slugify(word) for word in WORDS}
+    titles = []
+    for _ in range(TITLE_POOL):
+        words = rng.choices(WORDS, k=rng.randint(*TITLE_WORDS))
+        titles.append((
+            ' '.join(words).capitalize(),
+            '-'.join(word_slugs[word] for word in words),
+        ))
+    return titles
+
+
+def make_texts(rng):
+    """
+    Тексты логнормальной длины: в основном короткие заметки, изредка
+    очень длинные. Каждый текст — отрезок общего корпуса с начала слова.
+    """
+    corpus = ' '.join(rng.choices(WORDS, k=CORPUS_WORDS))
+    texts = []
+    for _ in range(TEXT_POOL):
+        length = int(rng.lognormvariate(TEXT_LENGTH_MU, TEXT_LENGTH_SIGMA))
+        length = min(max(length, TEXT_LENGTH_LIMITS[0]), TEXT_LENGTH_LIMITS[1])
+        offset = corpus.find(' ', rng.randrange(len(corpus) - length)) + 1
+        texts.append(corpus[offset:offset + length].strip())
+    return texts
+
+
+class NoteInserter:
+    """
+    Пакетная вставка заметок одним подготовленным INSERT через executemany.
+
+    bulk_create собирает SQL заново для каждой пачки и создаёт модель на
+    каждую строку; на миллионе заметок это минуты. Здесь одна заметка
+    переиспользуется как шаблон: её поля заполняются, производные поля
+    считаются моделью, а значения для базы готовят сами поля, так что
+    новые поля Note подхватываются без правок команды.
+    """
+
+    def __init__(self):
+        self.note = Note()
+        self.fields = [
+            field for field in Note._meta.concrete_fields
+            if not field.primary_key
+        ]
+        # Поля с auto_now/auto_now_add одинаковы для всех строк запуска:
+        # готовим их значение один раз.
+        self.constants = {
+            field.attname: field.get_db_prep_save(
+                field.pre_save(self.note, True), connection
+            )
+            for field in self.fields
+            if getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False)
+        }
+        self.preparers = [
+            (field.attname, self.get_preparer(field))
+            for field in self.fields
+        ]
+        columns = ', '.join(
+            connection.ops.quote_name(field.column) for field in self.fields
+        )
+        placeholders = ', '.join(['%s'] * len(self.fields))
+        self.sql = (
+            f'INSERT INTO {connection.ops.quote_name(Note._meta.db_table)} '
+            f'({columns}) VALUES ({placeholders})'
+        )
+
+    def get_preparer(self, field):
+        if field.attname in self.constants:
+            return None
+        if type(field) in PASSTHROUGH_FIELDS:
+            return passthrough
+        return partial(field.get_db_prep_save, connection=connection)
+
+    def row(self, title, text, slug, author_id):
+        note = self.note
+        note.title, note.text, note.slug = title, text, slug
+        note.author_id = author_id
+        # Markdown отрисовывать здесь слишком долго: HTML нарисует
+        # render_notes или первое открытие заметки.
+        note.refresh_derived_fields(html=False)
+        return [
+            prepare(getattr(note, attname))
+            if prepare else self.constants[attname]
+            for attname, prepare in self.preparers
+        ]
+
+    def insert(self, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(self.sql, rows)
+
+
+def passthrough(value):
+    return value
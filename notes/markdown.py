@@ -0,0 +1,18 @@
+"""
+Отрисовка текста заметок из Markdown в HTML.
+
+HTML хранится в заметке вместе с номером версии отрисовки. Когда правила
+отрисовки меняются, RENDERER_VERSION увеличивается: старые HTML
+перерисовываются при открытии заметки или командой render_notes.
+"""
+from markdown_it import MarkdownIt
+
+RENDERER_VERSION = 1
+
+# HTML в тексте не пропускается, а выводится как текст; ссылки со схемами
+# javascript:, vbscript:, file: и data: markdown-it не создаёт.
+_renderer = MarkdownIt('commonmark', {'html': False}).enable('table')
+
+
+def render(text):
+    return _renderer.render(text)
@@ -0,0 +1,47 @@
+"""
+Сбор замеров запросов для RequestMetricsMiddleware.
+
+Для каждого представления хранится скользящее окно последних замеров
+в памяти процесса; по нему считаются перцентили.
+"""
+from collections import defaultdict, deque
+from threading import Lock
+
+SAMPLE_SIZE = 1000
+PERCENTILES = (50, 95, 99)
+METRICS = ('total_ms', 'db_ms', 'render_ms', 'queries')
+
+_samples = defaultdict(lambda: deque(maxlen=SAMPLE_SIZE))
+_lock = Lock()
+
+
+def record(view_name, **sample):
+    with _lock:
+        _samples[view_name].append(sample)
+
+
+def percentile(ordered, percent):
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+    return ordered[index]
+
+
+def summary():
+    """Перцентили каждого показателя по представлениям."""
+    with _lock:
+        samples = {name: list(items) for name, items in _samples.items()}
+    result = {}
+    for view_name, items in sorted(samples.items()):
+        view_summary = {'count': len(items)}
+        for metric in METRICS:
+            ordered = sorted(item[metric] for item in items)
+            view_summary[metric] = {
+                f'p{percent}': percentile(ordered, percent)
+                for percent in PERCENTILES
+            }
+        result[view_name] = view_summary
+    return result
+
+
+def reset():
+    with _lock:
+        _samples.clear()
@@ -0,0 +1,101 @@
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+logger = logging.getLogger('notes.performance')
+
+PRIMARY_COOKIE = 'notes_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper: считает запросы к базе и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет каждый запрос: общее время, число и время запросов к базе,
+    время отрисовки шаблонов. Превышение бюджета запросов представления
+    (PERF_QUERY_BUDGETS) пишется в лог как предупреждение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        total = perf_counter() - started
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        metrics.record(
+            view_name,
+            total_ms=total * 1000,
+            db_ms=counter.duration * 1000,
+            render_ms=getattr(request, 'template_render_time', 0.0) * 1000,
+            queries=counter.count,
+        )
+        budget = settings.PERF_QUERY_BUDGETS.get(
+            view_name, settings.PERF_DEFAULT_QUERY_BUDGET
+        )
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                'Представление %s выполнило %d запросов к базе '
+                '(бюджет %d): %s',
+                view_name, counter.count, budget, request.path
+            )
+        return response
+
+
+def _read_from_primary(content):
+    with routers.use_primary():
+        yield from content
+
+
+class PrimaryPinningMiddleware:
+    """
+    Читать свои записи при работе с репликами. Запрос на запись целиком
+    обслуживает основная база, а клиент получает cookie, с которой его
+    запросы ещё REPLICA_PIN_SECONDS тоже читают из основной базы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        write = request.method not in SAFE_METHODS
+        pinned = write or PRIMARY_COOKIE in request.COOKIES
+        with routers.use_primary(pinned):
+            response = self.get_response(request)
+        if pinned and response.streaming:
+            # Потоковый ответ читает базу уже после выхода из middleware.
+            response.streaming_content = _read_from_primary(
+                response.streaming_content
+            )
+        if write and response.status_code < 400:
+            response.set_cookie(
+                PRIMARY_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
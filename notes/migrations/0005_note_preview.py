@@ -0,0 +1,48 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:11
+
+from django.db import migrations, models
+
+PREVIEW_LENGTH = 200
+BATCH_SIZE = 1000
+
+
+def make_preview(text):
+    """
+    Копия notes.models.make_preview на момент миграции: превью старых
+    заметок должны совпадать с теми, что модель считает при сохранении.
+    """
+    head = text[:PREVIEW_LENGTH * 2]
+    preview = ' '.join(head.split())
+    if len(preview) > PREVIEW_LENGTH or len(text) > len(head):
+        preview = preview[:PREVIEW_LENGTH - 1].rstrip() + '…'
+    return preview
+
+
+def fill_previews(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    queryset = Note.objects.only('id', 'text').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for note in batch:
+            note.preview = make_preview(note.text)
+        Note.objects.bulk_update(batch, ('preview',))
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='preview',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='Начало текста'),
+        ),
+        migrations.RunPython(fill_previews, migrations.RunPython.noop),
+    ]
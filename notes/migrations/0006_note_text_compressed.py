@@ -0,0 +1,67 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:39
+
+import zlib
+from base64 import b64decode
+
+from django.db import migrations
+import notes.fields
+
+MARKER = 'zlib:'
+BATCH_SIZE = 1000
+
+
+def decompress_texts(apps, schema_editor):
+    """
+    Откат: распаковывает сжатые тексты, иначе после отката в text
+    остались бы строки zlib: в base64. Прямые UPDATE, потому что поле
+    модели при записи сжало бы текст снова.
+    """
+    table = apps.get_model('notes', 'Note')._meta.db_table
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f'SELECT id, text FROM {table} WHERE id > %s '
+                'AND substr(text, 1, %s) = %s ORDER BY id LIMIT %s',
+                [last_id, len(MARKER), MARKER, BATCH_SIZE]
+            )
+            batch = cursor.fetchall()
+            if not batch:
+                break
+            updates = []
+            for note_id, text in batch:
+                try:
+                    text = zlib.decompress(
+                        b64decode(text[len(MARKER):], validate=True)
+                    ).decode()
+                except (ValueError, zlib.error):
+                    # Обычный текст, который просто начинается с MARKER.
+                    continue
+                updates.append((text, note_id))
+            cursor.executemany(
+                f'UPDATE {table} SET text = %s WHERE id = %s', updates
+            )
+            last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_preview'),
+    ]
+
+    # Столбец остаётся TEXT, меняется только класс поля: таблицу
+    # не перестраиваем, существующие строки сжимает команда compress_notes,
+    # а откат их распаковывает.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='note',
+                    name='text',
+                    field=notes.fields.CompressedTextField(help_text='Добавьте подробностей', verbose_name='Текст'),
+                ),
+            ],
+        ),
+        migrations.RunPython(migrations.RunPython.noop, decompress_texts),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_changes(apps, schema_editor):
+    """Каждая существующая заметка попадает в ленту одним изменением."""
+    Note = apps.get_model('notes', 'Note')
+    NoteChange = apps.get_model('notes', 'NoteChange')
+    schema_editor.execute(
+        f'INSERT INTO {NoteChange._meta.db_table} '
+        '(author_id, note_id, slug, deleted, changed_at) '
+        'SELECT author_id, id, slug, %s, updated_at '
+        f'FROM {Note._meta.db_table} ORDER BY id',
+        [False]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0006_note_text_compressed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeHorizon',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('seq', models.BigIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NoteChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.BigIntegerField(unique=True)),
+                ('slug', models.SlugField(db_index=False, max_length=100)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(auto_now=True)),
+                ('author', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notechange',
+            index=models.Index(fields=['author', 'id'], name='notechange_author_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notechange',
+            index=models.Index(condition=models.Q(('deleted', True)), fields=['changed_at'], name='notechange_tombstone_idx'),
+        ),
+        migrations.RunPython(fill_changes, migrations.RunPython.noop),
+    ]
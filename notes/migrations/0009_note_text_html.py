@@ -0,0 +1,26 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:51
+
+from django.db import migrations, models
+import notes.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0008_tasks'),
+    ]
+
+    # HTML существующих заметок остаётся с версией 0: его отрисуют при
+    # открытии заметки или командой render_notes.
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Версия отрисовки HTML'),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='text_html',
+            field=notes.fields.CompressedTextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.15 on 2026-10-18 17:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def fill_stats(apps, schema_editor):
+    """Размеры текстов существующих заметок и статистика их авторов."""
+    Note = apps.get_model('notes', 'Note')
+    UserNoteStats = apps.get_model('notes', 'UserNoteStats')
+    queryset = Note.objects.only('id', 'text').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for note in batch:
+            note.text_bytes = len(note.text.encode())
+        Note.objects.bulk_update(batch, ('text_bytes',))
+        last_id = batch[-1].id
+    schema_editor.execute(
+        f'INSERT INTO {UserNoteStats._meta.db_table} '
+        '(author_id, note_count, total_bytes, last_write_at) '
+        'SELECT author_id, COUNT(*), SUM(text_bytes), MAX(updated_at) '
+        f'FROM {Note._meta.db_table} GROUP BY author_id'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notes', '0010_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserNoteStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('note_count', models.PositiveIntegerField(default=0, verbose_name='Заметок')),
+                ('total_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Размер текстов')),
+                ('last_write_at', models.DateTimeField(blank=True, null=True, verbose_name='Последнее изменение')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='text_bytes',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Размер текста в байтах'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
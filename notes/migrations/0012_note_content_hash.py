@@ -0,0 +1,53 @@
+# Generated by Django 3.2.15 on 2026-10-18 18:02
+
+import unicodedata
+from hashlib import sha256
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def content_hash(title, text):
+    title = ' '.join(title.split())
+    lines = text.strip().splitlines()
+    normalized = '\n'.join([title, *(line.rstrip() for line in lines)])
+    return sha256(
+        unicodedata.normalize('NFC', normalized).encode()
+    ).hexdigest()
+
+
+def fill_hashes(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    queryset = Note.objects.only('id', 'title', 'text').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for note in batch:
+            note.content_hash = content_hash(note.title, note.text)
+        Note.objects.bulk_update(batch, ('content_hash',))
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0011_user_note_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name='Хеш содержимого'),
+        ),
+        # Индекс строится после заполнения: так bulk_update не обновляет
+        # его на каждой пачке.
+        migrations.RunPython(fill_hashes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'content_hash'], name='note_author_hash_idx'),
+        ),
+    ]
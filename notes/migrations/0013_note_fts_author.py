@@ -0,0 +1,73 @@
+from django.db import migrations
+
+FTS_TABLE = 'notes_note_fts'
+BATCH_SIZE = 1000
+
+
+def create_fts_table(schema_editor, columns):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({", ".join(columns)})'
+    )
+
+
+def fill_fts_table(apps, schema_editor, with_author):
+    Note = apps.get_model('notes', 'Note')
+    queryset = Note.objects.only(
+        'id', 'author', 'title', 'text'
+    ).order_by('id')
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        with schema_editor.connection.cursor() as cursor:
+            if with_author:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, author, title, text) '
+                    'VALUES (%s, %s, %s, %s)',
+                    [
+                        (note.id, f'u{note.author_id}', note.title, note.text)
+                        for note in batch
+                    ]
+                )
+            else:
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, text) '
+                    'VALUES (%s, %s, %s)',
+                    [(note.id, note.title, note.text) for note in batch]
+                )
+        last_id = batch[-1].id
+
+
+def add_author_column(apps, schema_editor):
+    """
+    Токен автора в индексе: поиск пользователя ранжирует только его
+    заметки. Колонка author не влияет на ранг (вес bm25 равен нулю).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    create_fts_table(schema_editor, ('author', 'title', 'text'))
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+        "VALUES ('rank', 'bm25(0.0, 1.0, 1.0)')"
+    )
+    fill_fts_table(apps, schema_editor, with_author=True)
+
+
+def remove_author_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    create_fts_table(schema_editor, ('title', 'text'))
+    fill_fts_table(apps, schema_editor, with_author=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0012_note_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_author_column, remove_author_column),
+    ]
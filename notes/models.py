@@ -1,7 +1,45 @@
+import unicodedata
+from hashlib import sha256
+
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+from . import markdown
+from .fields import CompressedTextField
+
+PREVIEW_LENGTH = 200
+
+
+def make_preview(text):
+    """
+    Начало текста одной строкой для списка заметок. Смотрим только на
+    начало текста, чтобы не проходить целиком многомегабайтные заметки.
+    """
+    head = text[:PREVIEW_LENGTH * 2]
+    preview = ' '.join(head.split())
+    if len(preview) > PREVIEW_LENGTH or len(text) > len(head):
+        preview = preview[:PREVIEW_LENGTH - 1].rstrip() + '…'
+    return preview
+
+
+def text_size(text):
+    """Размер текста в байтах UTF-8, без учёта сжатия в базе."""
+    return len(text.encode())
+
 
-from pytils.translit import slugify
+def content_hash(title, text):
+    """
+    Хеш заголовка и текста после нормализации: Unicode NFC, пробелы в
+    заголовке, пробелы в конце строк и по краям текста не учитываются.
+    Совпадение хешей заметок одного автора считаем дублем.
+    """
+    title = ' '.join(title.split())
+    lines = text.strip().splitlines()
+    normalized = '\n'.join([title, *(line.rstrip() for line in lines)])
+    return sha256(
+        unicodedata.normalize('NFC', normalized).encode()
+    ).hexdigest()
 
 
 class Note(models.Model):
@@ -11,7 +49,7 @@ class Note(models.Model):
         default='Название заметки',
         help_text='Дайте короткое название заметке'
     )
-    text = models.TextField(
+    text = CompressedTextField(
         'Текст',
         help_text='Добавьте подробностей'
     )
@@ -27,12 +65,248 @@ class Note(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+    preview = models.CharField(
+        'Начало текста',
+        max_length=PREVIEW_LENGTH,
+        blank=True,
+        editable=False,
+    )
+    text_html = CompressedTextField('Текст в HTML', blank=True, editable=False)
+    html_version = models.PositiveSmallIntegerField(
+        'Версия отрисовки HTML', default=0, editable=False
+    )
+    text_bytes = models.PositiveIntegerField(
+        'Размер текста в байтах', default=0, editable=False
+    )
+    content_hash = models.CharField(
+        'Хеш содержимого', max_length=64, blank=True, editable=False
+    )
+
+    tags = models.ManyToManyField(
+        'Tag',
+        through='NoteTag',
+        blank=True,
+        related_name='notes',
+        verbose_name='Теги',
+    )
+
+    # Размер текста в базе, пока заметка не сохранена: его задаёт from_db.
+    stored_text_bytes = None
+
+    # Поля, которые вычисляются из text (и title) при сохранении.
+    derived_fields = (
+        'preview', 'text_html', 'html_version', 'text_bytes', 'content_hash'
+    )
+
+    class Meta:
+        # Постраничный вывод списка идёт по (author, id): каждая страница
+        # читается из индекса диапазоном, без OFFSET.
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='note_author_id_idx'
+            ),
+            # Поиск дубля заметки автора одним чтением индекса.
+            models.Index(
+                fields=('author', 'content_hash'),
+                name='note_author_hash_idx',
+            ),
+        )
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        note = super().from_db(db, field_names, values)
+        # Размер текста в базе до изменений: по нему считается, насколько
+        # сохранение изменит статистику автора. None — поле не загружено.
+        note.stored_text_bytes = note.__dict__.get('text_bytes')
+        return note
+
+    def refresh_derived_fields(self, html=True):
+        """
+        Пересчитывает поля, производные от текста. Вызывается из save()
+        и вручную перед bulk_create/bulk_update, которые save() не вызывают.
+        С html=False HTML остаётся устаревшим и отрисуется позже.
+        """
+        self.preview = make_preview(self.text)
+        self.text_bytes = text_size(self.text)
+        self.content_hash = content_hash(self.title, self.text)
+        if html:
+            self.refresh_html()
+        else:
+            self.text_html, self.html_version = '', 0
+
+    def refresh_html(self):
+        self.text_html = markdown.render(self.text)
+        self.html_version = markdown.RENDERER_VERSION
+
+    @property
+    def html_is_stale(self):
+        return self.html_version != markdown.RENDERER_VERSION
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'title', 'text'} & set(update_fields):
+            self.refresh_derived_fields()
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, *self.derived_fields
+                }
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+        from .slugs import save_with_generated_slug
+        save_with_generated_slug(self, super().save, *args, **kwargs)
+
+
+class Tag(models.Model):
+    """
+    Тег пользователя. Число заметок с тегом хранится в note_count и
+    меняется вместе с привязками (см. notes.tags), чтобы не считать
+    COUNT(*) при каждом показе списка.
+    """
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    name = models.CharField('Название', max_length=50)
+    note_count = models.PositiveIntegerField('Заметок', default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('author', 'name'), name='tag_author_name_unique'
+            ),
+        )
+
+    def __str__(self):
+        return self.name
+
+
+class NoteTag(models.Model):
+    """Привязка тега к заметке."""
+    note = models.ForeignKey(Note, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+
+    class Meta:
+        # Уникальный индекс (note, tag) служит выборке тегов заметок,
+        # индекс (tag, note) — выборке заметок с тегом по порядку id.
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'tag'), name='notetag_note_tag_unique'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('tag', 'note'), name='notetag_tag_note_idx'),
+        )
+
+
+class NoteChange(models.Model):
+    """
+    Последнее изменение заметки для ленты синхронизации. На заметку одна
+    строка: при изменении она заменяется новой, с бо́льшим id, поэтому id
+    служит номером изменения, и лента растёт с числом изменений, а не
+    заметок. Удаление оставляет строку-надгробие.
+    """
+    # Без ограничения внешнего ключа: надгробия заметок пишутся в
+    # post_delete, в том числе когда удаляется сам автор.
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        related_name='+',
+    )
+    note_id = models.BigIntegerField(unique=True)
+    slug = models.SlugField(max_length=100, db_index=False)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='notechange_author_id_idx'
+            ),
+            models.Index(
+                fields=('changed_at',),
+                condition=models.Q(deleted=True),
+                name='notechange_tombstone_idx',
+            ),
+        )
+
+
+class ChangeHorizon(models.Model):
+    """Номер последнего надгробия автора, удалённого при сжатии ленты."""
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    seq = models.BigIntegerField()
+
+
+class UserNoteStats(models.Model):
+    """
+    Статистика заметок автора для квот и сводок. Меняется приращениями
+    вместе с заметками (см. notes.stats), чтобы не считать COUNT(*) и
+    сумму размеров по всем заметкам; расхождения исправляет команда
+    reconcile_note_stats.
+    """
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+    )
+    note_count = models.PositiveIntegerField('Заметок', default=0)
+    total_bytes = models.PositiveBigIntegerField('Размер текстов', default=0)
+    last_write_at = models.DateTimeField(
+        'Последнее изменение', null=True, blank=True
+    )
+
+
+class Task(models.Model):
+    """
+    Фоновое задание над заметкой, выполняет его команда run_tasks.
+    В очереди не бывает двух одинаковых ожидающих заданий: повторная
+    постановка того же задания для той же заметки ничего не добавляет.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField(max_length=50)
+    note_id = models.BigIntegerField()
+    state = models.CharField(max_length=10, choices=STATES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('kind', 'note_id'),
+                condition=models.Q(state='pending'),
+                name='task_pending_unique',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('state', 'run_after'), name='task_state_idx'
+            ),
+        )
@@ -7,6 +7,13 @@ from django.test.client import Client
 from notes.models import Note
 
 
+@pytest.fixture(autouse=True)
+def inline_tasks(settings):
+    # Тесты ждут результат заданий (индекс поиска) сразу после запроса,
+    # что бы ни стояло в YANOTE_TASKS_MODE. Очередь тесты включают сами.
+    settings.NOTES_TASKS_MODE = 'inline'
+
+
 @pytest.fixture
 # Используем встроенную фикстуру для модели пользователей django_user_model.
 def author(django_user_model):
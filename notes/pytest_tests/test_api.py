@@ -0,0 +1,255 @@
+from http import HTTPStatus
+from io import StringIO
+import json
+import re
+import pytest
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from notes.models import ChangeHorizon, Note, NoteChange
+
+
+def read_json(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return json.loads(response.content)
+
+
+def test_api_list_contains_only_own_notes(
+    note, author_client, not_author_client
+):
+    url = reverse('notes:api-list')
+    notes = read_json(author_client.get(url))
+    assert [item['slug'] for item in notes] == [note.slug]
+    assert read_json(not_author_client.get(url)) == []
+
+
+def test_api_fields_selection(note, author_client):
+    url = reverse('notes:api-list')
+    response = author_client.get(url, {'fields': 'id,slug,title'})
+    assert read_json(response) == [
+        {'id': note.id, 'slug': note.slug, 'title': note.title}
+    ]
+    response = author_client.get(url, {'fields': 'id, slug,,title,'})
+    assert read_json(response) == [
+        {'id': note.id, 'slug': note.slug, 'title': note.title}
+    ]
+    response = author_client.get(url, {'fields': 'password'})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert read_json(response) == {
+        'errors': {'__all__': ['Неизвестные поля: password']}
+    }
+
+
+def test_api_create_validates_with_note_form(author_client, note, form_data):
+    url = reverse('notes:api-list')
+    response = author_client.post(
+        url, json.dumps(form_data), content_type='application/json'
+    )
+    assert response.status_code == HTTPStatus.CREATED
+    assert read_json(response)['slug'] == form_data['slug']
+    response = author_client.post(
+        url, json.dumps({**form_data, 'text': 'Другой текст'}),
+        content_type='application/json'
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert 'slug' in read_json(response)['errors']
+    assert Note.objects.count() == 2
+
+
+def test_api_update_and_delete(author_client, not_author_client, note):
+    url = reverse('notes:api-detail', args=(note.slug,))
+    response = not_author_client.patch(
+        url, json.dumps({'title': 'Чужой'}), content_type='application/json'
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+    assert read_json(response) == {
+        'errors': {'__all__': ['Заметка не найдена.']}
+    }
+    response = author_client.patch(
+        url, json.dumps({'title': 'Новый'}), content_type='application/json'
+    )
+    assert read_json(response)['title'] == 'Новый'
+    note.refresh_from_db()
+    assert note.title == 'Новый'
+    assert note.text == 'Текст заметки'
+    response = author_client.delete(url)
+    assert response.status_code == HTTPStatus.NO_CONTENT
+    assert Note.objects.count() == 0
+
+
+def test_api_forbidden_for_anonymous(client):
+    response = client.get(reverse('notes:api-list'))
+    assert response.status_code == HTTPStatus.FORBIDDEN
+    assert response['Content-Type'] == 'application/json'
+    assert read_json(response)['errors']
+
+
+def test_changes_feed_since_cursor(author_client, not_author_client, note):
+    url = reverse('notes:api-changes')
+    feed = read_json(author_client.get(url, {'fields': 'title'}))
+    assert feed['changes'] == [{
+        'seq': feed['cursor'], 'id': note.id, 'slug': note.slug,
+        'deleted': False, 'note': {'title': note.title},
+    }]
+    assert feed['has_more'] is False
+    assert read_json(not_author_client.get(url))['changes'] == []
+
+    cursor = feed['cursor']
+    assert read_json(author_client.get(url, {'since': cursor}))[
+        'changes'
+    ] == []
+    note.title = 'Новый'
+    note.save()
+    feed = read_json(author_client.get(url, {'since': cursor}))
+    assert [item['note']['title'] for item in feed['changes']] == ['Новый']
+
+    cursor = feed['cursor']
+    author_client.delete(reverse('notes:api-detail', args=(note.slug,)))
+    feed = read_json(author_client.get(url, {'since': cursor}))
+    assert feed['changes'] == [{
+        'seq': feed['cursor'], 'id': note.id, 'slug': note.slug,
+        'deleted': True,
+    }]
+
+
+@pytest.mark.parametrize('since', ('abc', '-1', str(2 ** 63), '9' * 30))
+def test_changes_feed_bad_since(author_client, since):
+    url = reverse('notes:api-changes')
+    response = author_client.get(url, {'since': since})
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+def test_changes_feed_after_compaction(author_client, note):
+    url = reverse('notes:api-changes')
+    cursor = read_json(author_client.get(url))['cursor']
+    note.delete()
+    call_command('compact_changes', days=-1, stdout=StringIO())
+    response = author_client.get(url, {'since': cursor})
+    assert response.status_code == HTTPStatus.GONE
+    assert read_json(author_client.get(url))['changes'] == []
+
+
+def test_compaction_after_user_deleted(author, not_author, note):
+    Note.objects.create(
+        title='Чужая', text='Текст', slug='other', author=not_author
+    )
+    Note.objects.filter(author=not_author).get().delete()
+    # Надгробие удалённого пользователя, оставшееся от прежних версий.
+    NoteChange.objects.create(
+        author_id=not_author.pk + 100, note_id=10 ** 6, slug='gone',
+        deleted=True,
+    )
+    author.delete()
+    assert not NoteChange.objects.filter(author_id=author.pk).exists()
+    call_command('compact_changes', days=-1, stdout=StringIO())
+    assert not NoteChange.objects.filter(deleted=True).exists()
+    assert list(
+        ChangeHorizon.objects.values_list('author_id', flat=True)
+    ) == [not_author.pk]
+
+
+def test_bulk_delete_in_one_query(author, author_client, not_author, note):
+    other = Note.objects.create(
+        title='Чужая', text='Текст', slug='other', author=not_author
+    )
+    second = Note.objects.create(
+        title='Вторая', text='Текст', slug='second', author=author
+    )
+    url = reverse('notes:api-bulk-delete')
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.post(url, json.dumps({
+            'ids': [note.id, other.id], 'slugs': [second.slug],
+        }), content_type='application/json')
+    assert read_json(response) == {'deleted': 2}
+    # Ровно один DELETE по самой таблице заметок, без ORM-удаления
+    # по одной заметке.
+    assert sum(
+        bool(re.match(r'DELETE FROM "?notes_note"? ', query['sql']))
+        for query in queries.captured_queries
+    ) == 1
+    assert list(Note.objects.all()) == [other]
+    changes = read_json(author_client.get(reverse('notes:api-changes')))
+    assert {item['id'] for item in changes['changes']} == {
+        note.id, second.id
+    }
+    assert all(item['deleted'] for item in changes['changes'])
+
+
+@pytest.mark.parametrize('data', (
+    {'ids': [2 ** 63]},
+    {'ids': [-1]},
+    {'ids': [True]},
+    {'ids': ['1']},
+    {'slugs': [['note-slug']]},
+    {'slugs': [1]},
+))
+def test_bulk_delete_rejects_bad_keys(author_client, note, data):
+    url = reverse('notes:api-bulk-delete')
+    response = author_client.post(
+        url, json.dumps(data), content_type='application/json'
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert Note.objects.filter(id=note.id).exists()
+
+
+@pytest.mark.parametrize('bad_item', (
+    {'title': 'Без ключа'},
+    {'slug': ['note-slug'], 'title': 'Список'},
+    {'id': '1', 'title': 'Строка'},
+    {'id': True, 'title': 'Логическое'},
+    {'id': 2 ** 63, 'title': 'Больше BIGINT'},
+    {'id': -1, 'title': 'Отрицательный'},
+    {'id': 1, 'slug': 'note-slug', 'title': 'Оба ключа'},
+))
+def test_bulk_update_rejects_bad_keys(author_client, note, bad_item):
+    url = reverse('notes:api-bulk-update')
+    with CaptureQueriesContext(connection) as queries:
+        response = author_client.post(url, json.dumps({'notes': [
+            {'id': note.id, 'title': 'Новый'}, bad_item,
+        ]}), content_type='application/json')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert set(read_json(response)['errors']) == {'1'}
+    assert not any(
+        'notes_note' in query['sql'] for query in queries.captured_queries
+    )
+
+
+def test_bulk_update_validates_all_or_nothing(author, author_client, note):
+    second = Note.objects.create(
+        title='Вторая', text='Текст', slug='second', author=author
+    )
+    url = reverse('notes:api-bulk-update')
+    response = author_client.post(url, json.dumps({'notes': [
+        {'id': note.id, 'title': 'Новый'},
+        {'slug': 'missing', 'title': 'Нет такой'},
+        {'id': second.id, 'text': ''},
+    ]}), content_type='application/json')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert set(read_json(response)['errors']) == {'1', '2'}
+    note.refresh_from_db()
+    assert note.title == 'Заголовок'
+
+    response = author_client.post(url, json.dumps({'notes': [
+        {'slug': note.slug, 'title': 'Новый', 'text': 'Новый текст'},
+    ]}), content_type='application/json')
+    assert read_json(response) == {'updated': 1}
+    note.refresh_from_db()
+    assert (note.title, note.text, note.preview) == (
+        'Новый', 'Новый текст', 'Новый текст'
+    )
+
+
+def test_bulk_update_rejects_duplicate_notes(author_client, note):
+    url = reverse('notes:api-bulk-update')
+    response = author_client.post(url, json.dumps({'notes': [
+        {'id': note.id, 'title': 'Первый'},
+        {'slug': note.slug, 'title': 'Второй'},
+    ]}), content_type='application/json')
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    assert set(read_json(response)['errors']) == {'1'}
+    note.refresh_from_db()
+    assert note.title == 'Заголовок'
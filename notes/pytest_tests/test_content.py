@@ -1,8 +1,18 @@
+from http import HTTPStatus
+from io import StringIO
+
 import pytest
 
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from notes import caching, markdown, search, tags
 from notes.forms import NoteForm
+from notes.models import Note
+from notes.templatetags.notes_extras import note_url, prefetched_tags
+from notes.views import NotesList
 
 
 @pytest.mark.parametrize(
@@ -44,3 +54,218 @@ def test_edit_note_page_contains_form(slug_for_args, author_client):
     assert 'form' in response.context
     # Проверяем, что объект формы относится к нужному классу.
     assert isinstance(response.context['form'], NoteForm)
+
+
+def test_notes_list_keyset_pagination(author, author_client):
+    """Список отдаётся страницами, следующая начинается после id"""
+    Note.objects.bulk_create(
+        Note(title=f'Заметка {i}', text='Текст', slug=f'note-{i}',
+             author=author)
+        for i in range(NotesList.paginate_by + 1)
+    )
+    url = reverse('notes:list')
+    response = author_client.get(url)
+    first_page = response.context['object_list']
+    assert len(first_page) == NotesList.paginate_by
+    next_cursor = response.context['next_cursor']
+    assert next_cursor == first_page[-1].id
+    response = author_client.get(url, {'after': next_cursor})
+    second_page = response.context['object_list']
+    assert len(second_page) == 1
+    assert second_page[0].id > next_cursor
+    assert response.context['next_cursor'] is None
+
+
+@pytest.mark.parametrize('after', ('abc', '-1', str(2 ** 63), '9' * 30))
+def test_notes_list_bad_cursor_not_found(author_client, after):
+    response = author_client.get(reverse('notes:list'), {'after': after})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    'parametrized_client, note_in_results',
+    (
+        (pytest.lazy_fixture('author_client'), True),
+        (pytest.lazy_fixture('not_author_client'), False),
+    )
+)
+def test_search_finds_only_own_notes(
+    note, parametrized_client, note_in_results
+):
+    """Поиск находит заметку по тексту и только у её автора"""
+    url = reverse('notes:search')
+    response = parametrized_client.get(url, {'q': 'текст'})
+    object_list = response.context['object_list']
+    assert (note in object_list) is note_in_results
+
+
+def test_search_matches_only_authors_rows(author, note, not_author):
+    Note.objects.create(
+        title='Чужая', text='Текст заметки', slug='other', author=not_author
+    )
+    with CaptureQueriesContext(connection) as queries:
+        assert search.search(author, 'текст') == [note]
+    assert f'author : {search.author_token(author.pk)}' in (
+        queries.captured_queries[0]['sql']
+    )
+    # Токен автора не ищется как слово заметки.
+    assert search.search(author, search.author_token(author.pk)) == []
+
+
+def test_search_index_follows_note_changes(author_client, note):
+    url = reverse('notes:search')
+    note.text = 'Совсем другое содержание'
+    note.save()
+    response = author_client.get(url, {'q': 'заметки'})
+    assert note not in response.context['object_list']
+    response = author_client.get(url, {'q': 'содержание'})
+    assert note in response.context['object_list']
+    note.delete()
+    response = author_client.get(url, {'q': 'содержание'})
+    assert len(response.context['object_list']) == 0
+
+
+def test_detail_page_is_cached_until_note_changes(author_client, note):
+    url = reverse('notes:detail', args=(note.slug,))
+    caching.reset_stats()
+    author_client.get(url)
+    response = author_client.get(url)
+    assert caching.get_stats()['hits'] == 1
+    assert note.title in response.content.decode()
+    note.title = 'Обновлённый заголовок'
+    note.save()
+    response = author_client.get(url)
+    assert caching.get_stats()['misses'] == 2
+    assert note.title in response.content.decode()
+
+
+@pytest.mark.parametrize(
+    'name, args',
+    (
+        ('notes:detail', pytest.lazy_fixture('slug_for_args')),
+        ('notes:list', None),
+    ),
+)
+def test_conditional_get_returns_not_modified(
+    author_client, note, name, args
+):
+    url = reverse(name, args=args)
+    etag = author_client.get(url)['ETag']
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    note.text = 'Изменённый текст'
+    note.save()
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_notes_list_does_not_load_text(author_client, note):
+    response = author_client.get(reverse('notes:list'))
+    listed_note = response.context['object_list'][0]
+    assert 'text' in listed_note.get_deferred_fields()
+    assert listed_note.preview == note.text
+
+
+def test_notes_list_links_match_reverse(author_client, note):
+    response = author_client.get(reverse('notes:list'))
+    detail_url = reverse('notes:detail', args=(note.slug,))
+    assert note_url(note.slug) == detail_url
+    assert f'href="{detail_url}"' in response.content.decode()
+
+
+def test_cached_header_follows_username(author, author_client):
+    url = reverse('notes:home')
+    assert author.username in author_client.get(url).content.decode()
+    author.username = 'Новое имя'
+    author.save()
+    assert 'Новое имя' in author_client.get(url).content.decode()
+
+
+def test_admin_changelist_search_without_full_count(admin_client, note):
+    url = reverse('admin:notes_note_changelist')
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.get(url, {'q': 'текст'})
+    assert list(response.context['cl'].result_list) == [note]
+    assert not any(
+        query['sql'].startswith('SELECT COUNT(*) AS "__count" FROM')
+        for query in queries.captured_queries
+    )
+
+
+def test_detail_renders_sanitized_markdown(author_client, note):
+    note.text = '**жирный** <script>alert(1)</script> [ссылка](javascript:x)'
+    note.save()
+    assert note.html_version == markdown.RENDERER_VERSION
+    response = author_client.get(reverse('notes:detail', args=(note.slug,)))
+    content = response.content.decode()
+    assert '<strong>жирный</strong>' in content
+    assert '<script>' not in content
+    assert 'href="javascript' not in content
+
+
+def test_stale_html_rendered_lazily_and_by_command(
+        author_client, author, note
+):
+    Note.objects.update(text_html='', html_version=0)
+    url = reverse('notes:detail', args=(note.slug,))
+    assert '<p>Текст заметки</p>' in author_client.get(url).content.decode()
+    note.refresh_from_db()
+    assert not note.html_is_stale
+    other = Note.objects.create(
+        title='Вторая', text='# Заголовок', slug='second', author=author
+    )
+    Note.objects.update(text_html='', html_version=0)
+    call_command('render_notes', stdout=StringIO())
+    other.refresh_from_db()
+    assert other.text_html == '<h1>Заголовок</h1>\n'
+    assert not other.html_is_stale
+
+
+def test_notes_list_filters_by_tag_with_prefetch(author, author_client):
+    notes = [
+        Note.objects.create(
+            title=f'Заметка {number}', text='Текст', slug=f'note-{number}',
+            author=author,
+        )
+        for number in range(6)
+    ]
+    for note in notes:
+        tags.set_note_tags(note, ['все', f'чёт-{note.id % 2}'])
+    url = reverse('notes:list')
+    with CaptureQueriesContext(connection) as few:
+        author_client.get(url, {'tag': 'все', 'after': notes[3].id})
+    response = author_client.get(url, {'tag': 'все'})
+    # Число запросов не зависит от числа заметок на странице.
+    assert len(response.context['object_list']) == len(notes)
+    caching.bump_version(author.pk)
+    with CaptureQueriesContext(connection) as many:
+        author_client.get(url, {'tag': 'все'})
+    assert len(many) == len(few)
+    tagged = author_client.get(url, {'tag': f'чёт-{notes[0].id % 2}'})
+    assert list(tagged.context['object_list']) == notes[::2]
+    assert {tag.name: tag.note_count for tag in tagged.context['tags']} == {
+        'все': 6, 'чёт-0': 3, 'чёт-1': 3,
+    }
+    unknown = author_client.get(url, {'tag': 'нет такого'})
+    assert list(unknown.context['object_list']) == []
+
+
+def test_prefetched_tags_without_prefetch_skips_queries(note):
+    tags.set_note_tags(note, ['дом'])
+    with CaptureQueriesContext(connection) as queries:
+        assert prefetched_tags(note) == ()
+    assert len(queries) == 0
+    note = Note.objects.prefetch_related('tags').get(pk=note.pk)
+    assert [tag.name for tag in prefetched_tags(note)] == ['дом']
+
+
+def test_version_bumped_again_after_commit(
+        author, note, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            note.title = 'Новый заголовок'
+            note.save()
+            # Параллельный запрос до фиксации видит уже новую версию.
+            version_before_commit = caching.get_version(author.pk)
+    assert caching.get_version(author.pk) != version_before_commit
@@ -1,12 +1,27 @@
 from http import HTTPStatus
+from io import StringIO
+import json
+import runpy
 import pytest
 from pytils.translit import slugify
 from pytest_django.asserts import assertRedirects, assertFormError
 
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
+from notes import metrics, routers, search, stats, tasks
+from notes.fields import MARKER
 from notes.forms import WARNING
-from notes.models import Note
+from notes.middleware import PRIMARY_COOKIE
+from notes.models import Note, Tag, Task, UserNoteStats
+from notes.routers import PrimaryReplicaRouter
+from yanote import settings as project_settings
 
 
 # Указываем фикстуру form_data в параметрах теста.
@@ -115,3 +130,378 @@ def test_other_user_cant_delete_note(not_author_client, slug_for_args):
     response = not_author_client.post(url)
     assert response.status_code == HTTPStatus.NOT_FOUND
     assert Note.objects.count() == 1
+
+
+def test_export_import_round_trip(author, note, tmp_path):
+    """Выгруженные заметки не дублируются, новые получают slug"""
+    path = tmp_path / 'notes.jsonl'
+    call_command('export_notes', output=str(path), stderr=StringIO())
+    with open(path, 'a', encoding='utf-8') as source:
+        for text in ('Без slug', ' Без slug \n'):
+            source.write(json.dumps({
+                'title': note.title, 'text': text, 'author': author.username
+            }) + '\n')
+    out = StringIO()
+    call_command('import_notes', str(path), batch_size=2, stdout=out)
+    assert 'Загружено заметок: 1, пропущено строк: 0, дублей: 2' in (
+        out.getvalue()
+    )
+    slugs = set(Note.objects.values_list('slug', flat=True))
+    assert slugs == {note.slug, slugify(note.title)}
+
+
+def test_import_reports_bad_records(author, tmp_path):
+    """Не объекты и некорректные поля пропускаются с номером строки"""
+    path = tmp_path / 'notes.jsonl'
+    lines = (
+        [1],
+        'x',
+        {'title': 'З' * 101, 'text': 'Текст'},
+        {'title': 'Заголовок', 'text': 'Текст', 'slug': 's' * 101},
+        {'title': ['Список'], 'text': 'Текст'},
+        {'title': 'Пробелы', 'text': 'Текст', 'slug': 'a b/c"<x>'},
+        {'title': 'Кириллица', 'text': 'Текст', 'slug': 'привет'},
+        {'title': 'Автор-список', 'text': 'Текст', 'author': ['a']},
+        {'title': 'Автор-объект', 'text': 'Текст', 'author': {'x': 1}},
+        {'title': 'Годная', 'text': 'Текст'},
+    )
+    path.write_text(
+        ''.join(json.dumps(line) + '\n' for line in lines), encoding='utf-8'
+    )
+    out, err = StringIO(), StringIO()
+    call_command(
+        'import_notes', str(path), author=author.username,
+        stdout=out, stderr=err,
+    )
+    assert 'Загружено заметок: 1, пропущено строк: 9' in out.getvalue()
+    for line_number in range(1, 10):
+        assert f'Строка {line_number}:' in err.getvalue()
+    assert list(Note.objects.values_list('title', flat=True)) == ['Годная']
+
+
+def test_generated_slug_collision_gets_suffix(author_client, form_data):
+    """Совпавший slug из заголовка получает суффикс вместо ошибки"""
+    url = reverse('notes:add')
+    form_data.pop('slug')
+    author_client.post(url, data=form_data)
+    response = author_client.post(
+        url, data={**form_data, 'text': 'Другой текст'}
+    )
+    assertRedirects(response, reverse('notes:success'))
+    expected_slug = slugify(form_data['title'])
+    slugs = set(Note.objects.values_list('slug', flat=True))
+    assert slugs == {expected_slug, f'{expected_slug}-2'}
+
+
+def test_request_metrics_middleware(settings, author_client, note, caplog):
+    """Запрос попадает в сводку, превышение бюджета пишется в лог"""
+    settings.MIDDLEWARE = [
+        'notes.middleware.RequestMetricsMiddleware', *settings.MIDDLEWARE
+    ]
+    settings.PERF_QUERY_BUDGETS = {'notes:list': 0}
+    metrics.reset()
+    author_client.get(reverse('notes:list'))
+    summary = metrics.summary()['notes:list']
+    assert summary['count'] == 1
+    assert summary['queries']['p50'] > 0
+    assert summary['render_ms']['p50'] > 0
+    assert 'notes:list' in caplog.text
+
+
+@pytest.mark.django_db
+def test_seed_notes_is_deterministic():
+    for prefix in ('a', 'b'):
+        call_command(
+            'seed_notes', users=3, notes=20, prefix=prefix,
+            stdout=StringIO()
+        )
+    assert Note.objects.count() == 40
+    first, second = (
+        list(Note.objects.filter(slug__startswith=prefix).order_by(
+            'id'
+        ).values_list('title', 'text', 'preview'))
+        for prefix in ('a-', 'b-')
+    )
+    assert first == second
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas_applied_on_connect(settings):
+    settings.SQLITE_PRAGMAS = {'cache_size': -1234}
+    connection_created.send(sender=connection.__class__, connection=connection)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        assert cursor.fetchone()[0] == -1234
+
+
+def test_router_reads_from_replica_unless_pinned(settings):
+    settings.DATABASE_REPLICAS = ['replica']
+    router = PrimaryReplicaRouter()
+    assert router.db_for_read(Note) == 'replica'
+    assert router.db_for_write(Note) == 'default'
+    with routers.use_primary():
+        assert router.db_for_read(Note) == 'default'
+    with routers.use_primary(False):
+        assert router.db_for_read(Note) == 'replica'
+
+
+def test_pinning_middleware_sets_cookie_after_write(
+        settings, author_client, form_data
+):
+    settings.MIDDLEWARE = [
+        'notes.middleware.PrimaryPinningMiddleware', *settings.MIDDLEWARE
+    ]
+    response = author_client.get(reverse('notes:list'))
+    assert PRIMARY_COOKIE not in response.cookies
+    response = author_client.post(reverse('notes:add'), data=form_data)
+    assert response.cookies[PRIMARY_COOKIE]['max-age'] == (
+        settings.REPLICA_PIN_SECONDS
+    )
+
+
+@pytest.mark.django_db
+def test_cached_session_mode_skips_session_and_user_queries(
+        settings, author, note
+):
+    settings.SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    settings.AUTHENTICATION_BACKENDS = ['notes.backends.CachedModelBackend']
+    client = Client()
+    client.force_login(author)
+    url = reverse('notes:detail', args=(note.slug,))
+    client.get(url)
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(url).status_code == HTTPStatus.OK
+    tables = ' '.join(query['sql'] for query in queries.captured_queries)
+    assert 'django_session' not in tables
+    assert 'auth_user' not in tables
+    # Смена пароля сбрасывает пользователя в кэше, старая сессия
+    # перестаёт действовать.
+    author.set_password('new-password')
+    author.save()
+    assert client.get(url).status_code == HTTPStatus.FOUND
+
+
+def raw_text(note):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT text FROM notes_note WHERE id = %s', [note.pk])
+        return cursor.fetchone()[0]
+
+
+def test_cached_sessions_require_shared_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv('YANOTE_SESSION_MODE', 'cached_db')
+    monkeypatch.delenv('YANOTE_FILE_CACHE_DIR', raising=False)
+    with pytest.raises(ImproperlyConfigured):
+        runpy.run_path(project_settings.__file__)
+    monkeypatch.setenv('YANOTE_FILE_CACHE_DIR', str(tmp_path))
+    loaded = runpy.run_path(project_settings.__file__)
+    assert loaded['AUTHENTICATION_BACKENDS'] == [
+        'notes.backends.CachedModelBackend'
+    ]
+
+
+@pytest.mark.parametrize(
+    'text, stored_compressed',
+    (
+        ('Длинный лог. ' * 1000, True),
+        (MARKER + 'короткий текст', True),
+        ('Короткий текст', False),
+    )
+)
+def test_text_compression_round_trip(
+        author_client, note, text, stored_compressed
+):
+    note.text = text
+    note.save()
+    assert raw_text(note).startswith(MARKER) is stored_compressed
+    assert Note.objects.get(pk=note.pk).text == text
+    response = author_client.get(
+        reverse('notes:api-detail', args=(note.slug,))
+    )
+    assert response.json()['text'] == text
+    response = author_client.get(reverse('notes:api-list'))
+    assert json.loads(b''.join(response.streaming_content))[0]['text'] == (
+        text
+    )
+
+
+def test_legacy_text_with_marker_is_read_as_is(author_client, note):
+    text = MARKER + 'обычный текст до сжатия'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE notes_note SET text = %s WHERE id = %s', [text, note.pk]
+        )
+    assert Note.objects.get(pk=note.pk).text == text
+    response = author_client.get(
+        reverse('notes:api-detail', args=(note.slug,))
+    )
+    assert response.json()['text'] == text
+
+
+def test_compress_notes_command(note):
+    text = 'Длинный лог. ' * 1000
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE notes_note SET text = %s WHERE id = %s', [text, note.pk]
+        )
+    output = StringIO()
+    call_command('compress_notes', stdout=output)
+    assert 'Сжато заметок: 1' in output.getvalue()
+    assert 'Файл базы: было' in output.getvalue()
+    assert 'notes_note_fts хранит несжатую копию' in output.getvalue()
+    assert raw_text(note).startswith(MARKER)
+    assert Note.objects.get(pk=note.pk).text == text
+
+
+def test_queued_search_index_runs_in_worker(settings, author, note):
+    settings.NOTES_TASKS_MODE = 'queue'
+    note.title = 'Отложенный'
+    note.save()
+    note.save()
+    assert Task.objects.count() == 1
+    assert search.search(author, 'Отложенный') == []
+    call_command('run_tasks', once=True, workers=1, stdout=StringIO())
+    assert search.search(author, 'Отложенный') == [note]
+    assert not Task.objects.exists()
+
+
+def test_failed_task_is_retried_then_marked_failed(
+        settings, note, monkeypatch
+):
+    settings.NOTES_TASKS_MODE = 'queue'
+    settings.NOTES_TASKS_MAX_ATTEMPTS = 2
+
+    def failing(note_ids):
+        raise RuntimeError('сбой')
+
+    monkeypatch.setitem(tasks.HANDLERS, 'search.index', failing)
+    tasks.enqueue('search.index', (note.pk,))
+    assert not tasks.execute('search.index', tasks.claim(10))
+    task = Task.objects.get()
+    assert (task.state, task.attempts) == (Task.PENDING, 1)
+    assert tasks.claim(10) == []
+    Task.objects.update(run_after=timezone.now())
+    tasks.execute('search.index', tasks.claim(10))
+    task = Task.objects.get()
+    assert (task.state, task.attempts) == (Task.FAILED, 2)
+    assert 'сбой' in task.last_error
+
+
+def tag_counts(user):
+    return dict(
+        Tag.objects.filter(author=user).values_list('name', 'note_count')
+    )
+
+
+def test_tag_counts_follow_notes(author, author_client, note, form_data):
+    edit_url = reverse('notes:edit', args=(note.slug,))
+    author_client.post(edit_url, {**form_data, 'tags': 'Дом, работа, дом'})
+    author_client.post(reverse('notes:add'), {
+        'title': 'Вторая', 'text': 'Текст', 'slug': 'second',
+        'tags': 'работа',
+    })
+    assert tag_counts(author) == {'дом': 1, 'работа': 2}
+    edit_url = reverse('notes:edit', args=(form_data['slug'],))
+    author_client.post(edit_url, {**form_data, 'tags': 'дом, отпуск'})
+    assert tag_counts(author) == {'дом': 1, 'работа': 1, 'отпуск': 1}
+    author_client.post(reverse('notes:delete', args=(form_data['slug'],)))
+    assert tag_counts(author) == {'дом': 0, 'работа': 1, 'отпуск': 0}
+    author_client.post(
+        reverse('notes:api-bulk-delete'),
+        json.dumps({'slugs': ['second']}), content_type='application/json'
+    )
+    assert tag_counts(author) == {'дом': 0, 'работа': 0, 'отпуск': 0}
+
+
+def note_stats(user):
+    row = stats.get_stats(user)
+    return row.note_count, row.total_bytes
+
+
+def test_note_stats_follow_writes(author, author_client, note, form_data):
+    size = len(note.text.encode())
+    assert note_stats(author) == (1, size)
+    author_client.post(reverse('notes:add'), form_data)
+    new_size = len(form_data['text'].encode())
+    assert note_stats(author) == (2, size + new_size)
+    edit_url = reverse('notes:edit', args=(form_data['slug'],))
+    author_client.post(edit_url, {**form_data, 'text': 'Длиннее текст'})
+    new_size = len('Длиннее текст'.encode())
+    assert note_stats(author) == (2, size + new_size)
+    author_client.post(
+        reverse('notes:api-bulk-update'),
+        json.dumps({'notes': [{'id': note.id, 'text': 'abc'}]}),
+        content_type='application/json',
+    )
+    assert note_stats(author) == (2, 3 + new_size)
+    author_client.post(
+        reverse('notes:api-bulk-delete'),
+        json.dumps({'ids': [note.id]}), content_type='application/json'
+    )
+    author_client.delete(
+        reverse('notes:api-detail', args=(form_data['slug'],))
+    )
+    assert note_stats(author) == (0, 0)
+    assert stats.get_stats(author).last_write_at is not None
+
+
+def test_quota_rejects_new_notes(settings, author_client, note, form_data):
+    settings.NOTES_QUOTA_NOTES = 1
+    response = author_client.post(reverse('notes:add'), form_data)
+    assertFormError(
+        response, 'form', None, 'Достигнут предел числа заметок: 1.'
+    )
+    assert Note.objects.count() == 1
+    settings.NOTES_QUOTA_NOTES = 0
+    settings.NOTES_QUOTA_BYTES = len(note.text.encode()) + 1
+    response = author_client.post(reverse('notes:add'), form_data)
+    assert response.status_code == HTTPStatus.OK
+    assert Note.objects.count() == 1
+    # Изменение, которое уменьшает текст, проходит и при квоте.
+    edit_url = reverse('notes:edit', args=(note.slug,))
+    author_client.post(edit_url, {**form_data, 'text': 'Т'})
+    note.refresh_from_db()
+    assert note.text == 'Т'
+
+
+def test_reconcile_note_stats_fixes_drift(author, not_author, note):
+    UserNoteStats.objects.filter(author=author).update(
+        note_count=5, total_bytes=0
+    )
+    Note.objects.filter(pk=note.pk).update(text_bytes=1)
+    out = StringIO()
+    call_command('reconcile_note_stats', sizes=True, stdout=out)
+    assert 'Исправлено размеров заметок: 1' in out.getvalue()
+    assert note_stats(author) == (1, len(note.text.encode()))
+    assert note_stats(not_author) == (0, 0)
+    assert UserNoteStats.objects.filter(author=not_author).exists()
+
+
+def test_repeated_create_returns_existing_note(author_client, form_data):
+    url = reverse('notes:add')
+    author_client.post(url, data=form_data)
+    # Повтор с другими пробелами — та же заметка.
+    response = author_client.post(url, data={
+        **form_data, 'title': f' {form_data["title"]} ',
+        'text': f'{form_data["text"]}  \n',
+    })
+    assertRedirects(response, reverse('notes:success'))
+    assert Note.objects.count() == 1
+    api_url = reverse('notes:api-list')
+    response = author_client.post(
+        api_url, json.dumps(form_data), content_type='application/json'
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert json.loads(response.content)['slug'] == form_data['slug']
+    assert Note.objects.count() == 1
+
+
+def test_delete_with_drifted_stats_does_not_fail(author, author_client):
+    UserNoteStats.objects.create(author=author)
+    # bulk_create не отправляет сигналов: статистика о заметке не знает.
+    Note.objects.bulk_create([Note(
+        title='Без статистики', text='Текст', slug='bulk', author=author,
+        text_bytes=len('Текст'.encode()),
+    )])
+    response = author_client.post(reverse('notes:delete', args=('bulk',)))
+    assert response.status_code == HTTPStatus.FOUND
+    assert note_stats(author) == (0, 0)
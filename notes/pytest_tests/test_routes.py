@@ -1,5 +1,7 @@
 from http import HTTPStatus
 
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
 from django.urls import reverse
 import pytest
 from pytest_django.asserts import assertRedirects
@@ -27,7 +29,7 @@ def test_pages_availability_for_anonymous_user(client, name):
 
 @pytest.mark.parametrize(
     'name',
-    ('notes:list', 'notes:add', 'notes:success')
+    ('notes:list', 'notes:add', 'notes:success', 'notes:search')
 )
 def test_pages_availability_for_auth_user(not_author_client, name):
     url = reverse(name)
@@ -65,6 +67,7 @@ def test_pages_availability_for_different_users(
         ('notes:add', None),
         ('notes:success', None),
         ('notes:list', None),
+        ('notes:search', None),
     ),
 )
 # Передаём в тест анонимный клиент, name проверяемых страниц и args:
@@ -75,3 +78,60 @@ def test_redirects(client, name, args):
     expected_url = f'{login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+def async_get(client, url):
+    async def get():
+        return await client.get(url)
+    return async_to_sync(get)()
+
+
+@pytest.mark.urls('yanote.urls_async')
+@pytest.mark.parametrize(
+    'user, expected_status',
+    (
+        (pytest.lazy_fixture('not_author'), HTTPStatus.NOT_FOUND),
+        (pytest.lazy_fixture('author'), HTTPStatus.OK),
+    ),
+)
+@pytest.mark.parametrize(
+    'name',
+    ('notes:detail', 'notes:api-detail'),
+)
+def test_async_pages_availability_for_different_users(
+        user, name, note, expected_status
+):
+    client = AsyncClient()
+    client.force_login(user)
+    url = reverse(name, args=(note.slug,))
+    response = async_get(client, url)
+    assert response.status_code == expected_status
+
+
+@pytest.mark.urls('yanote.urls_async')
+@pytest.mark.parametrize('name', ('notes:list', 'notes:api-list'))
+def test_async_lists_for_author(author, note, name):
+    client = AsyncClient()
+    client.force_login(author)
+    response = async_get(client, reverse(name))
+    assert response.status_code == HTTPStatus.OK
+    assert note.slug in response.content.decode()
+
+
+@pytest.mark.urls('yanote.urls_async')
+@pytest.mark.django_db
+def test_async_list_redirects_anonymous():
+    url = reverse('notes:list')
+    response = async_get(AsyncClient(), url)
+    assertRedirects(
+        response, f'{reverse("users:login")}?next={url}',
+        fetch_redirect_response=False
+    )
+
+
+def test_perf_stats_only_for_staff(author, author_client):
+    url = reverse('notes:perf')
+    assert author_client.get(url).status_code == HTTPStatus.FORBIDDEN
+    author.is_staff = True
+    author.save()
+    assert author_client.get(url).status_code == HTTPStatus.OK
@@ -0,0 +1,53 @@
+"""
+Маршрутизация запросов между основной базой и репликами для чтения.
+
+Запись всегда идёт в основную базу, чтение — в случайную реплику из
+DATABASE_REPLICAS. Чтение возвращается в основную базу внутри транзакции
+и пока действует use_primary: так клиент видит свои записи, даже если
+реплики ещё не догнали основную базу.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_use_primary = ContextVar('notes_use_primary', default=False)
+
+
+@contextmanager
+def use_primary(enabled=True):
+    """Направляет чтение внутри блока в основную базу."""
+    token = _use_primary.set(enabled or _use_primary.get())
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def read_alias():
+    replicas = settings.DATABASE_REPLICAS
+    if (
+        not replicas
+        or _use_primary.get()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    ):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Во всех базах одни и те же данные.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными из основной базы.
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,109 @@
+"""Полнотекстовый поиск по заметкам на основе SQLite FTS5."""
+from django.db import connection
+from django.db.models import Q
+
+from .models import Note
+
+FTS_TABLE = 'notes_note_fts'
+SEARCH_LIMIT = 50
+# Колонки индекса с текстом заметки; в колонке author — токен автора.
+TEXT_COLUMNS = '{title text}'
+
+
+def is_available():
+    """Индекс FTS5 создаётся миграцией только на SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(query):
+    """
+    Превращает пользовательский ввод в выражение MATCH: каждое слово
+    берётся в кавычки, чтобы операторы FTS5 не ломали запрос.
+    """
+    words = query.split()
+    words = ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+    return f'{TEXT_COLUMNS} : ({words})' if words else ''
+
+
+def author_token(author_id):
+    return f'u{author_id}'
+
+
+def index_notes(notes):
+    """
+    Добавляет или обновляет записи индекса для переданных заметок; у
+    заметок должен быть загружен author_id.
+    """
+    rows = [
+        (note.pk, author_token(note.author_id), note.title, note.text)
+        for note in notes
+    ]
+    if not rows or not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(row[0],) for row in rows]
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, author, title, text) '
+            'VALUES (%s, %s, %s, %s)',
+            rows
+        )
+
+
+def remove_notes(note_ids):
+    """Удаляет из индекса записи удалённых заметок."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(note_id,) for note_id in note_ids]
+        )
+
+
+def clear_index():
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+def matching_ids(query, limit=SEARCH_LIMIT):
+    """Номера заметок всех авторов под запрос, лучшие первыми."""
+    match = build_match_query(query)
+    if not match or not is_available():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY rank LIMIT %s',
+            (match, limit)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(user, query, limit=SEARCH_LIMIT):
+    """Заметки пользователя под запрос, по убыванию релевантности."""
+    match = build_match_query(query)
+    if not match:
+        return []
+    if not is_available():
+        # Без FTS5 остаётся только полный просмотр заметок пользователя.
+        return list(Note.objects.filter(
+            Q(title__icontains=query) | Q(text__icontains=query),
+            author=user,
+        )[:limit])
+    # Токен автора в MATCH: FTS5 ранжирует только заметки пользователя,
+    # а не совпадения всех авторов.
+    match = f'author : {author_token(user.pk)} AND {match}'
+    note_table = Note._meta.db_table
+    return list(Note.objects.raw(
+        f'SELECT n.* FROM ('
+        f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+        'ORDER BY rank LIMIT %s'
+        f') f JOIN {note_table} n ON n.id = f.rowid '
+        'WHERE n.author_id = %s ORDER BY f.rank',
+        (match, limit, user.pk)
+    ))
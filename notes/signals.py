@@ -0,0 +1,146 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import Signal, receiver
+
+from . import caching, changes, database, stats, tags, tasks
+from .models import Note
+
+# Отправляется после массовой записи заметок (bulk_create, bulk_update),
+# когда обычные post_save не срабатывают. Аргумент notes — список заметок
+# с заполненными id, created — новые ли это заметки, как у post_save.
+notes_bulk_saved = Signal()
+# То же для массового удаления, которое идёт одним запросом без post_delete.
+notes_bulk_deleted = Signal()
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def index_changed_note(sender, instance, **kwargs):
+    """Поддерживает поисковый индекс в актуальном состоянии."""
+    tasks.enqueue('search.index', (instance.pk,))
+
+
+@receiver(notes_bulk_saved, sender=Note)
+@receiver(notes_bulk_deleted, sender=Note)
+def index_bulk_changed_notes(sender, notes, **kwargs):
+    tasks.enqueue('search.index', [note.pk for note in notes])
+
+
+@receiver(post_save, sender=Note)
+def record_saved_note(sender, instance, **kwargs):
+    changes.record((instance,))
+
+
+@receiver(notes_bulk_saved, sender=Note)
+def record_bulk_saved_notes(sender, notes, **kwargs):
+    changes.record(notes)
+
+
+@receiver(post_delete, sender=Note)
+def record_deleted_note(sender, instance, **kwargs):
+    """Надгробие, чтобы удаление дошло до клиентов."""
+    changes.record((instance,), deleted=True)
+
+
+@receiver(notes_bulk_deleted, sender=Note)
+def record_bulk_deleted_notes(sender, notes, **kwargs):
+    changes.record(notes, deleted=True)
+
+
+@receiver(pre_save, sender=Note)
+def remember_stored_size(sender, instance, update_fields, **kwargs):
+    """Размер текста до сохранения, если заметку загрузили без него."""
+    if instance._state.adding or instance.stored_text_bytes is not None:
+        return
+    if update_fields is None or 'text' in update_fields:
+        instance.stored_text_bytes = Note.objects.filter(
+            pk=instance.pk
+        ).values_list('text_bytes', flat=True).first()
+
+
+@receiver(post_save, sender=Note)
+def count_saved_note(sender, instance, created, **kwargs):
+    stats.record_saved((instance,), created)
+
+
+@receiver(notes_bulk_saved, sender=Note)
+def count_bulk_saved_notes(sender, notes, created=False, **kwargs):
+    stats.record_saved(notes, created)
+
+
+@receiver(post_delete, sender=Note)
+def count_deleted_note(sender, instance, **kwargs):
+    stats.record_deleted((instance,))
+
+
+@receiver(notes_bulk_deleted, sender=Note)
+def count_bulk_deleted_notes(sender, notes, **kwargs):
+    stats.record_deleted(notes)
+
+
+@receiver(pre_delete, sender=Note)
+def detach_deleted_note_tags(sender, instance, **kwargs):
+    """Уменьшает счётчики тегов удаляемой заметки."""
+    tags.detach_notes((instance.pk,))
+
+
+@receiver(notes_bulk_deleted, sender=Note)
+def detach_bulk_deleted_notes_tags(sender, notes, **kwargs):
+    # Заметки уже удалены одним запросом; внешние ключи в SQLite
+    # проверяются при фиксации транзакции, так что привязки снимаются
+    # в той же транзакции.
+    tags.detach_notes([note.pk for note in notes])
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_author_pages(sender, instance, **kwargs):
+    """Изменение заметки сбрасывает кэш страниц её автора."""
+    caching.bump_version(instance.author_id)
+
+
+@receiver(notes_bulk_saved, sender=Note)
+@receiver(notes_bulk_deleted, sender=Note)
+def invalidate_bulk_authors_pages(sender, notes, **kwargs):
+    for author_id in {note.author_id for note in notes}:
+        caching.bump_version(author_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_pages(sender, instance, **kwargs):
+    """
+    Имя пользователя выводится в шапке, а id нового пользователя
+    может совпасть с id удалённого, поэтому сбрасываем и здесь.
+    """
+    caching.bump_version(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def forget_deleted_user_changes(sender, instance, **kwargs):
+    """
+    Надгробия заметок, удалённых вместе с пользователем, записываются
+    раньше: убираем их вместе с остальной лентой.
+    """
+    changes.forget_author(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_cached_user(sender, instance, **kwargs):
+    """Смена пароля, прав или имени сбрасывает пользователя в кэше."""
+    caching.forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        caching.forget_user(user.pk)
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    database.apply_sqlite_pragmas(connection)
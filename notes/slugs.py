@@ -0,0 +1,90 @@
+"""
+Выдача уникальных slug для заметок.
+
+Вместо проверки существования перед каждым сохранением заметка
+сохраняется сразу, а столкновение с уникальным индексом slug
+обрабатывается повтором с числовым суффиксом.
+"""
+from pytils.translit import slugify
+
+from django.db import IntegrityError, transaction
+
+from .models import Note
+
+MAX_ATTEMPTS = 20
+DEFAULT_SLUG = 'note'
+
+
+def get_max_length():
+    return Note._meta.get_field('slug').max_length
+
+
+def from_title(title):
+    return slugify(title)[:get_max_length()] or DEFAULT_SLUG
+
+
+def with_suffix(slug, number):
+    """Первый вариант — сам slug, дальше slug-2, slug-3 и т. д."""
+    if number == 1:
+        return slug
+    suffix = f'-{number}'
+    return slug[:get_max_length() - len(suffix)] + suffix
+
+
+def is_taken(slug, exclude_pk=None):
+    return Note.objects.filter(slug=slug).exclude(pk=exclude_pk).exists()
+
+
+def save_with_generated_slug(note, save, *args, **kwargs):
+    """
+    Сохраняет заметку со slug из заголовка. Каждая попытка идёт в своей
+    точке сохранения, поэтому IntegrityError не ломает внешнюю транзакцию.
+    """
+    base = from_title(note.title)
+    for number in range(1, MAX_ATTEMPTS + 1):
+        note.slug = with_suffix(base, number)
+        try:
+            with transaction.atomic():
+                save(*args, **kwargs)
+            return
+        except IntegrityError:
+            if not is_taken(note.slug, exclude_pk=note.pk):
+                raise
+    note.slug = ''
+    raise IntegrityError(
+        f'Не удалось подобрать свободный slug за {MAX_ATTEMPTS} попыток.'
+    )
+
+
+def reserve_slugs(notes):
+    """
+    Пакетный режим для bulk_create: делает slug пачки уникальными до
+    записи в базу. Занятые в базе или внутри пачки значения получают
+    числовой суффикс; на каждый круг суффиксов уходит один запрос.
+    Пустые slug заполняются из заголовка.
+    """
+    for note in notes:
+        if not note.slug:
+            note.slug = from_title(note.title)
+    resolved = {}
+    pending = list(range(len(notes)))
+    number = 1
+    while pending:
+        candidates = {}
+        for index in pending:
+            slug = with_suffix(notes[index].slug, number)
+            candidates.setdefault(slug, []).append(index)
+        taken = set(Note.objects.filter(
+            slug__in=list(candidates)
+        ).values_list('slug', flat=True))
+        taken.update(resolved.values())
+        pending = []
+        for slug, indexes in candidates.items():
+            if slug in taken:
+                pending.extend(indexes)
+                continue
+            resolved[indexes[0]] = slug
+            pending.extend(indexes[1:])
+        number += 1
+    for index, slug in resolved.items():
+        notes[index].slug = slug
@@ -0,0 +1,175 @@
+"""
+Статистика заметок автора: число, суммарный размер текстов, время
+последнего изменения.
+
+Строка UserNoteStats меняется приращениями через F() в том же запросе,
+что и запись заметок, поэтому параллельные запросы не теряют изменений,
+а квоты и сводки читают одну строку вместо COUNT(*) и SUM по заметкам.
+Расхождения (записи в обход сигналов, ручные правки базы) исправляет
+reconcile().
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Greatest
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from .models import Note, UserNoteStats, text_size
+
+STATS_FIELDS = ('note_count', 'total_bytes', 'last_write_at')
+
+
+def record(author_id, notes=0, size=0):
+    """Прибавляет к статистике автора число заметок и байт."""
+    # Не ниже нуля: если статистика разошлась с заметками (вставка в
+    # обход сигналов), удаление не должно падать на CHECK поля.
+    updated = UserNoteStats.objects.filter(author_id=author_id).update(
+        note_count=Greatest(F('note_count') + notes, 0),
+        total_bytes=Greatest(F('total_bytes') + size, 0),
+        last_write_at=timezone.now(),
+    )
+    # Строки ещё нет: считаем её по заметкам. При удалении не создаём —
+    # заметки могут удаляться вместе с автором.
+    if not updated and notes >= 0:
+        reconcile((author_id,))
+
+
+def record_saved(notes, created):
+    """Учитывает сохранённые заметки, по одному запросу на автора."""
+    deltas = defaultdict(lambda: [0, 0])
+    for note in notes:
+        delta = deltas[note.author_id]
+        if created:
+            delta[0] += 1
+            delta[1] += note.text_bytes
+        elif note.stored_text_bytes is not None:
+            delta[1] += note.text_bytes - note.stored_text_bytes
+        note.stored_text_bytes = note.text_bytes
+    for author_id, (count, size) in deltas.items():
+        record(author_id, count, size)
+
+
+def record_deleted(notes):
+    """Учитывает удалённые заметки; у них должно быть загружено text_bytes."""
+    deltas = defaultdict(lambda: [0, 0])
+    for note in notes:
+        deltas[note.author_id][0] -= 1
+        deltas[note.author_id][1] -= note.text_bytes
+    for author_id, (count, size) in deltas.items():
+        record(author_id, count, size)
+
+
+def get_stats(user):
+    """Статистика пользователя; без строки в базе — нулевая."""
+    return (
+        UserNoteStats.objects.filter(author=user).first()
+        or UserNoteStats(author=user)
+    )
+
+
+def check_quota(author_id, notes=0, size=0):
+    """
+    Сообщение об ошибке, если запись notes заметок и size байт превысит
+    квоту автора, иначе None. Записи, которые ничего не добавляют,
+    проходят всегда.
+    """
+    if notes <= 0 and size <= 0:
+        return None
+    count, total = UserNoteStats.objects.filter(
+        author_id=author_id
+    ).values_list('note_count', 'total_bytes').first() or (0, 0)
+    max_notes = settings.NOTES_QUOTA_NOTES
+    if notes > 0 and max_notes and count + notes > max_notes:
+        return f'Достигнут предел числа заметок: {max_notes}.'
+    max_bytes = settings.NOTES_QUOTA_BYTES
+    if size > 0 and max_bytes and total + size > max_bytes:
+        return (
+            'Заметки заняли бы больше '
+            f'{filesizeformat(max_bytes)}, сократите тексты.'
+        )
+    return None
+
+
+def reconcile(author_ids):
+    """
+    Пересчитывает статистику авторов по их заметкам. Возвращает число
+    исправленных строк.
+    """
+    author_ids = list(author_ids)
+    # Транзакция начинается с записи (см. tasks.execute): пока статистика
+    # пересчитывается, приращения других запросов ждут её окончания.
+    with transaction.atomic():
+        UserNoteStats.objects.filter(author_id__in=author_ids).update(
+            note_count=F('note_count')
+        )
+        actual = {
+            row['author']: row for row in Note.objects.filter(
+                author_id__in=author_ids
+            ).values('author').annotate(
+                note_count=Count('id'),
+                total_bytes=Sum('text_bytes'),
+                last_write_at=Max('updated_at'),
+            ).order_by()
+        }
+        existing = UserNoteStats.objects.in_bulk(author_ids)
+        created, changed = [], []
+        for author_id in author_ids:
+            row = actual.get(author_id, {})
+            stats = existing.get(author_id)
+            if stats is None:
+                stats = UserNoteStats(author_id=author_id)
+                created.append(stats)
+            elif (stats.note_count, stats.total_bytes) != (
+                row.get('note_count', 0), row.get('total_bytes', 0)
+            ):
+                changed.append(stats)
+            stats.note_count = row.get('note_count', 0)
+            stats.total_bytes = row.get('total_bytes', 0)
+            stats.last_write_at = max(
+                filter(None, (stats.last_write_at, row.get('last_write_at'))),
+                default=None,
+            )
+        UserNoteStats.objects.bulk_create(created)
+        UserNoteStats.objects.bulk_update(changed, STATS_FIELDS)
+    return len(created) + len(changed)
+
+
+def reconcile_all(batch_size=500):
+    """Пересчитывает статистику всех пользователей пачками по id."""
+    users = get_user_model().objects.order_by('pk').values_list(
+        'pk', flat=True
+    )
+    fixed, last_id = 0, 0
+    while True:
+        author_ids = list(users.filter(pk__gt=last_id)[:batch_size])
+        if not author_ids:
+            return fixed
+        fixed += reconcile(author_ids)
+        last_id = author_ids[-1]
+
+
+def refresh_text_sizes(batch_size=500):
+    """
+    Пересчитывает text_bytes заметок пачками по id. Возвращает число
+    заметок, размер которых был неверен.
+    """
+    queryset = Note.objects.only('id', 'text', 'text_bytes').order_by('id')
+    fixed, last_id = 0, 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return fixed
+        wrong = []
+        for note in batch:
+            size = text_size(note.text)
+            if note.text_bytes != size:
+                note.text_bytes = size
+                wrong.append(note)
+        # bulk_update не трогает updated_at: текст заметки тот же.
+        Note.objects.bulk_update(wrong, ('text_bytes',))
+        fixed += len(wrong)
+        last_id = batch[-1].id
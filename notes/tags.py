@@ -0,0 +1,96 @@
+"""
+Теги заметок.
+
+Число заметок с тегом хранится в Tag.note_count и меняется здесь же, вместе
+с привязками: список тегов со счётчиками читается одним запросом без
+COUNT(*) по таблице привязок.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import NoteTag, Tag
+
+MAX_TAGS = 20
+SEPARATOR = ','
+
+
+def parse(value):
+    """
+    Имена тегов из строки через запятую: без пробелов по краям, в нижнем
+    регистре и без повторов, в исходном порядке.
+    """
+    names = []
+    for name in value.split(SEPARATOR):
+        name = ' '.join(name.split()).lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def join(names):
+    return f'{SEPARATOR} '.join(names)
+
+
+def note_tag_names(note):
+    return list(
+        note.tags.order_by('name').values_list('name', flat=True)
+    )
+
+
+def change_counts(tag_ids, delta):
+    Tag.objects.filter(id__in=tag_ids).update(
+        note_count=F('note_count') + delta
+    )
+
+
+def set_note_tags(note, names):
+    """Оставляет у заметки ровно теги names, создавая недостающие."""
+    current = dict(
+        NoteTag.objects.filter(note=note).values_list('tag__name', 'tag_id')
+    )
+    added = [name for name in names if name not in current]
+    removed = [
+        tag_id for name, tag_id in current.items() if name not in names
+    ]
+    with transaction.atomic(savepoint=False):
+        if removed:
+            NoteTag.objects.filter(note=note, tag_id__in=removed).delete()
+            change_counts(removed, -1)
+        if added:
+            Tag.objects.bulk_create(
+                (Tag(author_id=note.author_id, name=name) for name in added),
+                ignore_conflicts=True,
+            )
+            tag_ids = list(Tag.objects.filter(
+                author_id=note.author_id, name__in=added
+            ).values_list('id', flat=True))
+            NoteTag.objects.bulk_create(
+                NoteTag(note_id=note.pk, tag_id=tag_id) for tag_id in tag_ids
+            )
+            change_counts(tag_ids, 1)
+
+
+def detach_notes(note_ids):
+    """Снимает все теги с заметок и уменьшает счётчики тегов."""
+    rows = NoteTag.objects.filter(note_id__in=note_ids)
+    per_tag = rows.values('tag_id').annotate(count=Count('id')).order_by()
+    by_count = defaultdict(list)
+    for row in per_tag:
+        by_count[row['count']].append(row['tag_id'])
+    if not by_count:
+        return
+    with transaction.atomic(savepoint=False):
+        # Один UPDATE на каждое различное число заметок у тега: обычно
+        # это один-два запроса, а не по запросу на тег.
+        for count, tag_ids in by_count.items():
+            change_counts(tag_ids, -count)
+        rows.delete()
+
+
+def user_tags(user):
+    """Теги пользователя, у которых есть заметки, по имени."""
+    return Tag.objects.filter(
+        author=user, note_count__gt=0
+    ).order_by('name').only('id', 'name', 'note_count')
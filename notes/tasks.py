@@ -0,0 +1,171 @@
+"""
+Фоновые задания над заметками.
+
+Работа, которая не нужна для ответа на запрос записи, ставится в очередь
+(таблица Task) и выполняется командой run_tasks. Задание — это вид и id
+заметки; обработчик вида получает пачку id и сам читает из базы текущее
+состояние заметок, поэтому порядок заданий и их повторы не важны.
+
+В режиме NOTES_TASKS_MODE = 'inline' задания выполняются сразу, без
+очереди: так работают разработка и тесты.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from . import search
+from .models import Note, Task
+
+logger = logging.getLogger('notes.tasks')
+
+HANDLERS = {}
+
+
+def register(kind):
+    """Регистрирует обработчик вида заданий: функцию от списка id."""
+    def decorator(handler):
+        HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+
+def is_inline():
+    return settings.NOTES_TASKS_MODE == 'inline'
+
+
+def enqueue(kind, note_ids):
+    """Ставит задание для заметок; уже ожидающие задания не дублируются."""
+    note_ids = list(note_ids)
+    if not note_ids:
+        return
+    if is_inline():
+        HANDLERS[kind](note_ids)
+        return
+    Task.objects.bulk_create(
+        (Task(kind=kind, note_id=note_id) for note_id in note_ids),
+        ignore_conflicts=True,
+    )
+
+
+def claim(limit):
+    """
+    Забирает до limit готовых к выполнению заданий. UPDATE с проверкой
+    состояния не даст двум обработчикам забрать одно задание.
+    """
+    now = timezone.now()
+    ids = list(Task.objects.filter(
+        state=Task.PENDING, run_after__lte=now
+    ).order_by('id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid4().hex
+    Task.objects.filter(id__in=ids, state=Task.PENDING).update(
+        state=Task.RUNNING, claim=token, claimed_at=now
+    )
+    return list(Task.objects.filter(id__in=ids, claim=token))
+
+
+def group_by_kind(batch, parts=1):
+    """Делит пачку по видам заданий, а каждый вид — на parts частей."""
+    groups = defaultdict(list)
+    for task in batch:
+        groups[task.kind].append(task)
+    return [
+        (kind, group[start::parts])
+        for kind, group in groups.items()
+        for start in range(min(parts, len(group)))
+    ]
+
+
+def execute(kind, batch):
+    """Выполняет пачку заданий одного вида; при ошибке — повтор позже."""
+    # Транзакция начинается с записи: в SQLite транзакция, начатая
+    # чтением, не дожидается блокировки на запись, а сразу падает с
+    # "database is locked". При ошибке удаление заданий откатится.
+    try:
+        with transaction.atomic():
+            Task.objects.filter(id__in=[task.id for task in batch]).delete()
+            HANDLERS[kind]([task.note_id for task in batch])
+    except Exception as error:
+        logger.exception('Задание %s не выполнено', kind)
+        fail(batch, error)
+        return False
+    return True
+
+
+def fail(batch, error):
+    """
+    Возвращает задания в очередь с нарастающей паузой, после
+    NOTES_TASKS_MAX_ATTEMPTS попыток помечает их ошибкой.
+    """
+    now = timezone.now()
+    for task in batch:
+        task.attempts += 1
+        task.last_error = repr(error)
+        task.claim = ''
+        if task.attempts >= settings.NOTES_TASKS_MAX_ATTEMPTS:
+            task.state = Task.FAILED
+        else:
+            task.state = Task.PENDING
+            task.run_after = now + timedelta(seconds=2 ** task.attempts)
+        requeue(task)
+
+
+def requeue(task):
+    try:
+        with transaction.atomic():
+            task.save()
+    except IntegrityError:
+        # Пока задание выполнялось, в очередь встало такое же: оно и
+        # выполнит работу.
+        task.delete()
+
+
+def requeue_stale(timeout):
+    """Возвращает в очередь задания обработчиков, которые не завершились."""
+    stale = Task.objects.filter(
+        state=Task.RUNNING,
+        claimed_at__lt=timezone.now() - timedelta(seconds=timeout),
+    )
+    for task in stale:
+        task.state = Task.PENDING
+        task.claim = ''
+        requeue(task)
+
+
+def queue_stats():
+    """Глубина очереди: задания по состояниям и видам, возраст старейшего."""
+    by_state = dict(
+        Task.objects.values_list('state').annotate(Count('id'))
+    )
+    pending = Task.objects.filter(state=Task.PENDING)
+    oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+    return {
+        'pending': by_state.get(Task.PENDING, 0),
+        'running': by_state.get(Task.RUNNING, 0),
+        'failed': by_state.get(Task.FAILED, 0),
+        'pending_by_kind': dict(
+            pending.values_list('kind').annotate(Count('id'))
+        ),
+        'oldest_pending_seconds': (
+            (timezone.now() - oldest).total_seconds() if oldest else 0.0
+        ),
+    }
+
+
+@register('search.index')
+def update_search_index(note_ids):
+    """Индексирует заметки, а удалённые убирает из индекса."""
+    notes = list(Note.objects.filter(id__in=note_ids).only(
+        'id', 'author', 'title', 'text'
+    ))
+    search.index_notes(notes)
+    removed = set(note_ids) - {note.id for note in notes}
+    if removed:
+        search.remove_notes(removed)
@@ -0,0 +1,29 @@
+from time import perf_counter
+
+from django.template.backends.django import DjangoTemplates, Template
+
+
+class TimedTemplate(Template):
+    """Складывает время отрисовки в request.template_render_time."""
+
+    def render(self, context=None, request=None):
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            if request is not None:
+                request.template_render_time = (
+                    getattr(request, 'template_render_time', 0.0)
+                    + perf_counter() - started
+                )
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблоны Django с замером времени отрисовки для метрик запросов."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,38 @@
+from functools import lru_cache
+
+from django import template
+from django.conf import settings
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+register = template.Library()
+
+PLACEHOLDER = 'slug'
+
+
+@lru_cache(maxsize=None)
+def _detail_url_parts(urlconf, script_prefix):
+    url = reverse('notes:detail', args=(PLACEHOLDER,), urlconf=urlconf)
+    prefix, _, suffix = url.rpartition(PLACEHOLDER)
+    return prefix, suffix
+
+
+@register.filter
+def note_url(slug):
+    """
+    Адрес страницы заметки. reverse() выполняется один раз, дальше slug
+    подставляется в готовый префикс: в списке это заметно быстрее тега url
+    на каждую строку. Slug содержит только безопасные для URL символы.
+    """
+    prefix, suffix = _detail_url_parts(
+        get_urlconf() or settings.ROOT_URLCONF, get_script_prefix()
+    )
+    return f'{prefix}{slug}{suffix}'
+
+
+@register.filter
+def prefetched_tags(note):
+    """
+    Теги заметки из prefetch_related. Без предзагрузки — пусто, а не
+    запрос к базе на каждую строку списка.
+    """
+    return getattr(note, '_prefetched_objects_cache', {}).get('tags', ())
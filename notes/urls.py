@@ -1,6 +1,6 @@
 from django.urls import path
 
-from notes import views
+from notes import api, views
 
 app_name = 'notes'
 
@@ -11,5 +11,24 @@ urlpatterns = [
     path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
     path('notes/', views.NotesList.as_view(), name='list'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
+    path('perf/', views.PerfStats.as_view(), name='perf'),
+    path('api/notes/', api.NoteApiList.as_view(), name='api-list'),
+    path(
+        'api/notes/bulk-delete/',
+        api.NoteApiBulkDelete.as_view(),
+        name='api-bulk-delete',
+    ),
+    path(
+        'api/notes/bulk-update/',
+        api.NoteApiBulkUpdate.as_view(),
+        name='api-bulk-update',
+    ),
+    path(
+        'api/notes/<slug:slug>/',
+        api.NoteApiDetail.as_view(),
+        name='api-detail',
+    ),
+    path('api/changes/', api.NoteChanges.as_view(), name='api-changes'),
 ]
@@ -1,9 +1,21 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
+from hashlib import md5
+
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import (
+    Http404, HttpResponse, HttpResponseRedirect, JsonResponse
+)
+from django.db.models import Prefetch
 from django.urls import reverse_lazy
 from django.views import generic
+from django.views.decorators.http import condition
 
+from . import caching, markdown, metrics, search, tags
 from .forms import NoteForm
-from .models import Note
+from .models import Note, Tag
+
+
+# Наибольший id в базе: целое со знаком в 64 бита.
+MAX_ID = 2 ** 63 - 1
 
 
 class Home(generic.TemplateView):
@@ -26,22 +38,97 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class CachedPageMixin:
+    """
+    Отдаёт страницу из кэша, пока автор не изменил свои заметки.
+
+    Ключ включает id пользователя, версию его заметок и полный путь запроса.
+    """
+    cache_timeout = 300
+
+    def get_cache_key(self):
+        return caching.page_key(
+            self.request.user.pk, self.request.get_full_path()
+        )
+
+    def get_cached_response(self):
+        content = caching.get_cache().get(self.get_cache_key())
+        if content is None:
+            caching.record_miss()
+            return None
+        caching.record_hit()
+        return HttpResponse(content)
+
+    def cache_response(self, response):
+        response.render()
+        caching.get_cache().set(
+            self.get_cache_key(), response.content, self.cache_timeout
+        )
+        return response
+
+    def get(self, request, *args, **kwargs):
+        response = self.get_cached_response()
+        if response is None:
+            response = self.cache_response(
+                super().get(request, *args, **kwargs)
+            )
+        return response
+
+
+class ConditionalPageMixin:
+    """
+    Условный GET: при совпадении ETag или Last-Modified отвечаем 304,
+    не выполняя запросов за страницей и не отрисовывая шаблон.
+    """
+
+    def get_etag(self, request, *args, **kwargs):
+        return None
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        conditional_get = condition(
+            etag_func=self.get_etag,
+            last_modified_func=self.get_last_modified,
+        )(super().get)
+        return conditional_get(request, *args, **kwargs)
+
+
+class NoteFormBase(NoteBase):
+    """Общая часть создания и редактирования заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        note = form.save_checking_slug()
+        if note is None:
+            return self.form_invalid(form)
+        self.object = note
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class NoteCreate(NoteFormBase, generic.CreateView):
+    """Добавление заметки."""
+
+    def get_form_kwargs(self):
+        # Автор известен форме заранее: она проверяет его квоту.
+        kwargs = super().get_form_kwargs()
+        kwargs['instance'] = Note(author=self.request.user)
+        return kwargs
+
+    def form_valid(self, form):
+        # Повтор того же POST (клиент не дождался ответа) не создаёт
+        # дубль, а ведёт туда же, куда и первый.
+        duplicate = form.find_duplicate()
+        if duplicate is not None:
+            self.object = duplicate
+            return HttpResponseRedirect(self.get_success_url())
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteFormBase, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
@@ -49,11 +136,139 @@ class NoteDelete(NoteBase, generic.DeleteView):
     template_name = 'notes/delete.html'
 
 
-class NotesList(NoteBase, generic.ListView):
+class NotesList(
+    ConditionalPageMixin, CachedPageMixin, NoteBase, generic.ListView
+):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
+    paginate_by = 50
+    cursor_kwarg = 'after'
+    tag_kwarg = 'tag'
+    # Полный текст списку не нужен: хватает сохранённого начала.
+    list_fields = ('id', 'slug', 'title', 'preview')
+
+    def get_queryset(self):
+        queryset = super().get_queryset().only(*self.list_fields)
+        self.tag = None
+        name = self.request.GET.get(self.tag_kwarg)
+        if name:
+            # Сначала тег, потом заметки по индексу (tag, note) привязок.
+            self.tag = Tag.objects.filter(
+                author=self.request.user, name=name
+            ).only('id', 'name').first()
+            if self.tag is None:
+                return queryset.none()
+            queryset = queryset.filter(notetag__tag=self.tag)
+        # Теги всех заметок страницы — одним дополнительным запросом.
+        return queryset.prefetch_related(Prefetch(
+            'tags', queryset=Tag.objects.only('id', 'name').order_by('name')
+        ))
+
+    def get_etag(self, request, *args, **kwargs):
+        user_id = request.user.pk
+        tag = f'{user_id}:{caching.get_version(user_id)}:'
+        tag += request.get_full_path()
+        return md5(tag.encode()).hexdigest()
+
+    def get_last_modified(self, request, *args, **kwargs):
+        return caching.get_last_changed(request.user.pk)
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Постраничный вывод по курсору: следующая страница начинается
+        после последнего показанного id, а не через OFFSET.
+        """
+        after = self.request.GET.get(self.cursor_kwarg)
+        if after:
+            try:
+                after = int(after)
+            except ValueError:
+                raise Http404('Некорректный курсор страницы.')
+            # Больше 64 бит SQLite не примет: OverflowError при запросе.
+            if not 0 <= after <= MAX_ID:
+                raise Http404('Некорректный курсор страницы.')
+            queryset = queryset.filter(id__gt=after)
+        notes = list(queryset.order_by('id')[:page_size + 1])
+        has_next = len(notes) > page_size
+        notes = notes[:page_size]
+        self.next_cursor = notes[-1].id if has_next else None
+        return None, None, notes, has_next
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        context['tag'] = self.tag
+        context['tags'] = tags.user_tags(self.request.user)
+        return context
 
-class NoteDetail(NoteBase, generic.DetailView):
+
+class NoteDetail(
+    ConditionalPageMixin, CachedPageMixin, NoteBase, generic.DetailView
+):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get_queryset(self):
+        # Страница выводит готовый HTML, исходный текст не нужен.
+        return super().get_queryset().defer('text')
+
+    def get_object(self, queryset=None):
+        note = super().get_object(queryset)
+        if note.html_is_stale:
+            # HTML ещё не нарисован или нарисован прежней версией.
+            note.refresh_html()
+            Note.objects.filter(pk=note.pk).update(
+                text_html=note.text_html, html_version=note.html_version
+            )
+        return note
+
+    def get_cache_key(self):
+        return caching.page_key(
+            self.request.user.pk,
+            f'{self.request.get_full_path()}#{markdown.RENDERER_VERSION}',
+        )
+
+    def get_last_modified(self, request, *args, **kwargs):
+        if not hasattr(self, '_updated_at'):
+            self._updated_at = self.get_queryset().filter(
+                slug=kwargs['slug']
+            ).values_list('updated_at', flat=True).first()
+        return self._updated_at
+
+    def get_etag(self, request, *args, **kwargs):
+        updated_at = self.get_last_modified(request, *args, **kwargs)
+        if updated_at is None:
+            return None
+        # Имя пользователя выводится в шапке страницы.
+        tag = (
+            f'{request.user.username}:{kwargs["slug"]}:{updated_at}:'
+            f'{markdown.RENDERER_VERSION}'
+        )
+        return md5(tag.encode()).hexdigest()
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+    query_kwarg = 'q'
+
+    def get_queryset(self):
+        query = self.request.GET.get(self.query_kwarg, '').strip()
+        if not query:
+            return []
+        return search.search(self.request.user, query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get(self.query_kwarg, '')
+        return context
+
+
+class PerfStats(UserPassesTestMixin, generic.View):
+    """Перцентили замеров запросов по представлениям, только для персонала."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse(metrics.summary())
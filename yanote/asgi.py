@@ -3,14 +3,31 @@ ASGI config for yanote project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests served through ASGI are resolved against ``ASGI_ROOT_URLCONF``,
+where the read-heavy note views are replaced with their async versions.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
 
-application = get_asgi_application()
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    """Serves requests with the async URLconf instead of ROOT_URLCONF."""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_ROOT_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = AsyncViewsASGIHandler()
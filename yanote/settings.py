@@ -1,5 +1,7 @@
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -31,11 +33,25 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Замеры времени, запросов к базе и отрисовки шаблонов по каждому запросу.
+# Включаются переменной окружения YANOTE_REQUEST_METRICS=1, сводка
+# доступна персоналу на странице notes:perf.
+if os.getenv('YANOTE_REQUEST_METRICS'):
+    MIDDLEWARE.insert(0, 'notes.middleware.RequestMetricsMiddleware')
+
+# Сколько запросов к базе допустимо для представления; при превышении
+# пишется предупреждение в лог notes.performance.
+PERF_QUERY_BUDGETS = {
+    'notes:list': 6,
+    'notes:detail': 4,
+}
+PERF_DEFAULT_QUERY_BUDGET = 10
+
 ROOT_URLCONF = 'yanote.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'notes.template_backends.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -51,14 +67,126 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yanote.wsgi.application'
 
+ASGI_ROOT_URLCONF = 'yanote.urls_async'
+
+
+# Профиль базы задаётся переменной YANOTE_DB_PROFILE, путь к файлу —
+# YANOTE_DB_NAME. В профиле production SQLite работает в режиме WAL:
+# читатели не ждут писателя, а писатели ждут блокировку до timeout секунд
+# вместо ошибки "database is locked". Соединения переиспользуются между
+# запросами, прагмы выставляются при создании соединения.
+DB_PROFILE = os.getenv('YANOTE_DB_PROFILE', 'development')
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv('YANOTE_DB_NAME', BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': 20},
+    })
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'wal',
+        # С WAL коммит не ждёт fsync журнала, целостность сохраняется.
+        'synchronous': 'normal',
+        'busy_timeout': 20000,
+        # Отрицательное значение — размер в килобайтах: 64 МБ.
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'memory',
+    }
+
+
+# Реплики для чтения: YANOTE_DB_REPLICAS — пути к файлам SQLite через
+# запятую. Локально реплики — копии основной базы, их обновляет команда
+# sync_replicas. После записи клиент REPLICA_PIN_SECONDS читает из
+# основной базы, чтобы видеть свои изменения.
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5
+
+for number, name in enumerate(
+    filter(None, os.getenv('YANOTE_DB_REPLICAS', '').split(','))
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(alias)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['notes.routers.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index(
+            'django.contrib.sessions.middleware.SessionMiddleware'
+        ),
+        'notes.middleware.PrimaryPinningMiddleware',
+    )
+
+
+# По умолчанию кэш в памяти процесса. Чтобы кэш был общим для нескольких
+# процессов, укажите каталог в YANOTE_FILE_CACHE_DIR.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
 }
 
+if os.getenv('YANOTE_FILE_CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('YANOTE_FILE_CACHE_DIR'),
+    }
+
+NOTES_CACHE_ALIAS = 'default'
+
+# Фоновые задания (поисковый индекс и другие производные данные).
+# inline — выполнять сразу при записи; queue — ставить в очередь, которую
+# разбирает команда run_tasks, а запрос записи не ждёт этой работы.
+NOTES_TASKS_MODE = os.getenv('YANOTE_TASKS_MODE', 'inline')
+NOTES_TASKS_MAX_ATTEMPTS = 5
+
+# Тексты заметок длиннее стольких символов хранятся в базе сжатыми.
+NOTES_COMPRESS_THRESHOLD = 4096
+
+# Квоты автора: сколько заметок и байт текста (без учёта сжатия) можно
+# хранить. 0 — без ограничения.
+NOTES_QUOTA_NOTES = int(os.getenv('YANOTE_QUOTA_NOTES', 10_000))
+NOTES_QUOTA_BYTES = int(os.getenv('YANOTE_QUOTA_BYTES', 100 * 2 ** 20))
+
+# Сессии и пользователь без запросов к базе. YANOTE_SESSION_MODE:
+# db — как обычно; cached_db — сессия читается из кэша, а пишется и в
+# базу; signed_cookies — сессия целиком хранится в подписанной cookie.
+# В режимах кроме db пользователь сессии тоже берётся из кэша на
+# AUTH_USER_CACHE_TIMEOUT секунд; сохранение пользователя (в том числе
+# смена пароля) и выход сбрасывают его из кэша.
+SESSION_MODE = os.getenv('YANOTE_SESSION_MODE', 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_MODE}'
+AUTH_USER_CACHE_TIMEOUT = 300
+
+# Кэш в памяти процесса у каждого процесса свой: выход или смена пароля
+# сбросили бы сессию и пользователя только в одном из них, а остальные
+# ещё AUTH_USER_CACHE_TIMEOUT секунд пускали бы по старой сессии.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+if SESSION_MODE != 'db':
+    if CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f'YANOTE_SESSION_MODE={SESSION_MODE} требует общего для '
+            'процессов кэша: укажите YANOTE_FILE_CACHE_DIR.'
+        )
+    AUTHENTICATION_BACKENDS = ['notes.backends.CachedModelBackend']
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -0,0 +1,11 @@
+"""Корневые маршруты для ASGI: заметки обслуживают асинхронные версии."""
+from django.contrib import admin
+from django.urls import include, path
+
+from yanote.urls import auth_urls
+
+urlpatterns = [
+    path('', include('notes.async_urls')),
+    path('admin/', admin.site.urls),
+    path('auth/', include(auth_urls)),
+]